@@ -0,0 +1,289 @@
+"""
+Checks that the JSON Web Token blacklist backends behave alike, then
+measures their throughput: the Redis backend against the configured
+Redis (preferably a spare database, through REDIS_DATABASE), the
+Postgres one against a throwaway database created on the configured
+Postgres server, and the shared-memory one against a temporary table
+next to JWT_BLACKLIST_SHARED_MEMORY_PATH.
+
+The checks cover blocking, consuming once, expiry, legacy tokens, batch
+lookups and concurrent consumption of the same tokens, of which exactly
+one consumer must win: by coroutines and, for the shared-memory backend,
+by processes. The exit status is 1 if any check has failed.
+
+For the throughput, 'concurrency' clients go through 'operations'
+tokens per operation, with lookups batched as configured.
+
+Usage:
+  python -m benchmarks.blacklist_backends [--backends redis postgres shared-memory]
+                                          [--operations 10000] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from secrets import token_hex
+from typing import AsyncIterator, Awaitable, Callable
+
+from benchmarks.database import temporary_database
+from src.database.redis import redis
+from src.security.jwt import (
+    JWTBlacklist,
+    JWTBlacklistBackend,
+    PostgresBlacklistBackend,
+    RedisBlacklistBackend,
+    SharedMemoryBlacklistBackend
+)
+from src.settings import settings
+
+
+BACKENDS = ("redis", "postgres", "shared-memory")
+# Consumed by every process of the shared-memory check.
+PROCESS_TOKENS = 500
+PROCESSES = 4
+
+
+class CheckFailed(Exception):
+    pass
+
+
+def expect(condition: bool, description: str) -> None:
+    if not condition:
+        raise CheckFailed(description)
+
+
+def new_jti() -> str:
+    return f"benchmark-{token_hex(8)}"
+
+
+def get_exp(lifetime: int = 60) -> int:
+    return int(time.time()) + lifetime
+
+
+async def check_block(backend: JWTBlacklistBackend) -> None:
+    blacklist = JWTBlacklist(backend)
+    jti = new_jti()
+    expect(not await blacklist.is_blocked("", jti), "a new token is blocked")
+    await blacklist.block("", get_exp(), jti)
+    expect(await blacklist.is_blocked("", jti), "a blocked token isn't blocked")
+    expect(not await blacklist.is_blocked("", new_jti()), "another token is blocked")
+    # An expired token isn't stored at all.
+    jti = new_jti()
+    await blacklist.block("", get_exp(-10), jti)
+    expect(not await blacklist.is_blocked("", jti), "an expired token is blocked")
+
+
+async def check_consume(backend: JWTBlacklistBackend) -> None:
+    blacklist = JWTBlacklist(backend)
+    jti = new_jti()
+    expect(await blacklist.consume("", get_exp(), jti), "a new token can't be consumed")
+    expect(not await blacklist.consume("", get_exp(), jti), "a token is consumed twice")
+    expect(await blacklist.is_blocked("", jti), "a consumed token isn't blocked")
+
+    jti = new_jti()
+    await blacklist.block("", get_exp(), jti)
+    expect(not await blacklist.consume("", get_exp(), jti), "a blocked token is consumed")
+
+
+async def check_expiry(backend: JWTBlacklistBackend) -> None:
+    blacklist = JWTBlacklist(backend)
+    jti = new_jti()
+    exp = get_exp(1)
+    await blacklist.block("", exp, jti)
+    expect(await blacklist.is_blocked("", jti), "a blocked token isn't blocked")
+    # A token is accepted during the second of its 'exp', so it's kept
+    # until the next one, after which the record must have expired.
+    await asyncio.sleep(exp + 2 - time.time())
+    expect(not await blacklist.is_blocked("", jti), "an expired record is still blocking")
+    expect(await blacklist.consume("", get_exp(), jti), "an expired record prevents consumption")
+
+
+async def check_legacy(backend: JWTBlacklistBackend) -> None:
+    blacklist = JWTBlacklist(backend)
+    jwt = f"legacy.{token_hex(16)}.token"
+    expect(not await blacklist.is_blocked(jwt), "a new legacy token is blocked")
+    expect(await blacklist.consume(jwt, get_exp()), "a new legacy token can't be consumed")
+    expect(await blacklist.is_blocked(jwt), "a consumed legacy token isn't blocked")
+    expect(not await blacklist.consume(jwt, get_exp()), "a legacy token is consumed twice")
+
+
+async def check_batches(backend: JWTBlacklistBackend) -> None:
+    blacklist = JWTBlacklist(backend)
+    tokens = [("", new_jti()) for _ in range(50)] + [(f"legacy.{token_hex(16)}", None)]
+    blocked = set(range(0, len(tokens), 3))
+    for index in blocked:
+        jwt, jti = tokens[index]
+        await blacklist.block(jwt, get_exp(), jti)
+
+    expected = [index in blocked for index in range(len(tokens))]
+    expect(
+        await blacklist.are_blocked(tokens) == expected,
+        "a batch lookup is wrong"
+    )
+    batched_blacklist = JWTBlacklist(backend, batch_max_size=16)
+    results = await asyncio.gather(*(
+        batched_blacklist.is_blocked(jwt, jti) for jwt, jti in tokens
+    ))
+    expect(results == expected, "a coalesced lookup is wrong")
+
+
+async def check_concurrent_consumption(backend: JWTBlacklistBackend) -> None:
+    blacklist = JWTBlacklist(backend)
+    jtis = [new_jti() for _ in range(10)]
+    results = await asyncio.gather(*(
+        blacklist.consume("", get_exp(), jti) for jti in jtis for _ in range(8)
+    ))
+    expect(sum(results) == len(jtis), f"{sum(results)} consumptions won, {len(jtis)} expected")
+
+
+def consume_in_process(path: Path, capacity: int, jtis: list[str]) -> list[str]:
+    """
+    Returns: The identifiers of the tokens consumed by this process.
+    """
+    async def consume() -> list[str]:
+        backend = SharedMemoryBlacklistBackend(path, capacity)
+        blacklist = JWTBlacklist(backend)
+        try:
+            return [jti for jti in jtis if await blacklist.consume("", get_exp(), jti)]
+        finally:
+            await backend.stop()
+
+    return asyncio.run(consume())
+
+
+async def check_processes(backend: SharedMemoryBlacklistBackend) -> None:
+    jtis = [new_jti() for _ in range(PROCESS_TOKENS)]
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(PROCESSES, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = await asyncio.gather(*(
+            loop.run_in_executor(pool, consume_in_process, backend.path, backend.capacity, jtis)
+            for _ in range(PROCESSES)
+        ))
+    consumed = [jti for result in results for jti in result]
+    expect(
+        sorted(consumed) == sorted(jtis),
+        f"{len(consumed)} consumptions won by the processes, {len(jtis)} expected"
+    )
+
+
+CHECKS: dict[str, Callable[[JWTBlacklistBackend], Awaitable[None]]] = {
+    "block": check_block,
+    "consume": check_consume,
+    "expiry": check_expiry,
+    "legacy tokens": check_legacy,
+    "batches": check_batches,
+    "concurrent consumption": check_concurrent_consumption
+}
+
+
+async def run_checks(backend: JWTBlacklistBackend) -> list[str]:
+    """
+    Returns: The descriptions of the failed checks.
+    """
+    checks = dict(CHECKS)
+    if isinstance(backend, SharedMemoryBlacklistBackend):
+        checks["consumption by processes"] = check_processes
+
+    failures = []
+    for name, check in checks.items():
+        try:
+            await check(backend)
+        except CheckFailed as failure:
+            failures.append(f"{name}: {failure}")
+    return failures
+
+
+async def measure(operation: Callable[[str], Awaitable],
+                  operations: int,
+                  concurrency: int) -> float:
+    """
+    Returns: The number of operations per second.
+    """
+    jtis = [new_jti() for _ in range(operations)]
+
+    async def client() -> None:
+        while jtis:
+            await operation(jtis.pop())
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return operations / (time.perf_counter() - started_at)
+
+
+async def run_throughput(backend: JWTBlacklistBackend,
+                         operations: int,
+                         concurrency: int) -> dict[str, float]:
+    blacklist = JWTBlacklist(
+        backend,
+        batch_max_size=settings.JWT_BLACKLIST_BATCH_MAX_SIZE,
+        batch_max_wait=settings.JWT_BLACKLIST_BATCH_MAX_WAIT
+    )
+    exp = get_exp()
+    return {
+        "lookups/s": await measure(
+            lambda jti: blacklist.is_blocked("", jti), operations, concurrency
+        ),
+        "blocks/s": await measure(
+            lambda jti: blacklist.block("", exp, jti), operations, concurrency
+        ),
+        "consumptions/s": await measure(
+            lambda jti: blacklist.consume("", exp, jti), operations, concurrency
+        )
+    }
+
+
+@asynccontextmanager
+async def open_backend(name: str) -> AsyncIterator[JWTBlacklistBackend]:
+    if name == "postgres":
+        async with temporary_database("blacklist") as engine:
+            yield PostgresBlacklistBackend(engine)
+    elif name == "shared-memory":
+        directory = settings.JWT_BLACKLIST_SHARED_MEMORY_PATH.parent
+        with tempfile.TemporaryDirectory(dir=directory if directory.is_dir() else None) as path:
+            backend = SharedMemoryBlacklistBackend(
+                Path(path) / "jwt-blacklist", settings.JWT_BLACKLIST_SHARED_MEMORY_CAPACITY
+            )
+            try:
+                yield backend
+            finally:
+                await backend.stop()
+    else:
+        yield RedisBlacklistBackend(redis)
+
+
+async def run(backends: list[str], operations: int, concurrency: int) -> bool:
+    """
+    Returns: A Boolean value designating whether every check has passed.
+    """
+    is_conforming = True
+    for name in backends:
+        async with open_backend(name) as backend:
+            failures = await run_checks(backend)
+            result = await run_throughput(backend, operations, concurrency)
+        for failure in failures:
+            print(f"FAILED {name}, {failure}")
+        is_conforming = is_conforming and not failures
+        print(f"{name}: {'conforming' if not failures else 'NOT conforming'}, " + ", ".join(
+            f"{key}: {value:.0f}" for key, value in result.items()
+        ))
+    return is_conforming
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--operations", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    arguments = parser.parse_args()
+
+    if not asyncio.run(run(arguments.backends, arguments.operations, arguments.concurrency)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Compares blacklist lookups sent one by one with lookups coalesced into
+pipelined batches: lookups per second, Redis commands per second, and
+the latency of a single lookup.
+
+Usage:
+  python -m benchmarks.blacklist_batching [--lookups 100000] [--concurrency 256]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from aioredis import StrictRedis
+
+from src.security.jwt import JWTBlacklist, RedisBlacklistBackend
+from src.settings import settings
+
+
+async def run(blacklist: JWTBlacklist,
+              redis: StrictRedis,
+              lookups: int,
+              concurrency: int) -> dict:
+    latencies = []
+    lookups_left = lookups
+
+    async def client(index: int) -> None:
+        nonlocal lookups_left
+        while lookups_left > 0:
+            lookups_left -= 1
+            started_at = time.perf_counter()
+            await blacklist.is_blocked("", f"benchmark-{index}-{lookups_left}")
+            latencies.append(time.perf_counter() - started_at)
+
+    commands_before = (await redis.info("stats"))["total_commands_processed"]
+    started_at = time.perf_counter()
+    await asyncio.gather(*(client(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+    commands_after = (await redis.info("stats"))["total_commands_processed"]
+
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "lookups/s": lookups / elapsed,
+        # INFO itself is a command, and a pipeline counts once per command.
+        "redis commands/s": (commands_after - commands_before - 1) / elapsed,
+        "p50, ms": quantiles[49] * 1000,
+        "p99, ms": quantiles[98] * 1000,
+    }
+
+
+async def run_all(lookups: int, concurrency: int) -> None:
+    redis = StrictRedis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DATABASE,
+        password=settings.REDIS_PASSWORD
+    )
+    backend = RedisBlacklistBackend(redis)
+    configurations = {
+        "unbatched": JWTBlacklist(backend),
+        "batched, same tick": JWTBlacklist(
+            backend, settings.JWT_BLACKLIST_BATCH_MAX_SIZE
+        ),
+        "batched, 200 us window": JWTBlacklist(
+            backend, settings.JWT_BLACKLIST_BATCH_MAX_SIZE, 0.0002
+        ),
+    }
+    for name, blacklist in configurations.items():
+        result = await run(blacklist, redis, lookups, concurrency)
+        print(f"{name}: " + ", ".join(
+            f"{key}: {value:.1f}" for key, value in result.items()
+        ))
+    await redis.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, default=256)
+    arguments = parser.parse_args()
+    asyncio.run(run_all(arguments.lookups, arguments.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Compares the Redis memory taken by blacklisted JSON Web Tokens stored
+under the whole encoded token and under a digest of their 'jti'.
+
+The given Redis database is flushed, so use a dedicated one.
+
+Usage:
+  python -m benchmarks.blacklist_memory [--tokens 2000000] [--database 15]
+"""
+import argparse
+import asyncio
+from datetime import timedelta
+
+from aioredis import StrictRedis
+
+from src.security.jwt import JWTBlacklist, JWTMission, create_jwt, decode_jwt
+from src.settings import settings
+
+
+CHUNK_SIZE = 10_000
+
+
+async def measure(redis: StrictRedis, keys: list[bytes | str]) -> int:
+    """
+    Returns: The number of bytes taken by the given
+             keys, each set with an expiration time.
+    """
+    await redis.flushdb()
+    used_memory_before = (await redis.info("memory"))["used_memory"]
+
+    for offset in range(0, len(keys), CHUNK_SIZE):
+        pipeline = redis.pipeline(transaction=False)
+        for key in keys[offset:offset + CHUNK_SIZE]:
+            pipeline.set(key, 0, ex=3600)
+        await pipeline.execute()
+
+    used_memory_after = (await redis.info("memory"))["used_memory"]
+    await redis.flushdb()
+    return used_memory_after - used_memory_before
+
+
+async def run(tokens: int, database: int) -> None:
+    redis = StrictRedis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=database,
+        password=settings.REDIS_PASSWORD
+    )
+
+    # Signing is the slow part, and keys of the same length take the
+    # same memory, so a sample token is varied instead of signing each.
+    sample = create_jwt("123456", JWTMission.RECOVER_PASSWORD, timedelta(hours=2))
+    jti = decode_jwt(sample).jti
+    full_keys = [f"{sample[:-12]}{index:012d}" for index in range(tokens)]
+    digest_keys = [
+        JWTBlacklist.get_key(sample, f"{jti[:-8]}{index:08x}")
+        for index in range(tokens)
+    ]
+
+    for name, keys in (("encoded token", full_keys), ("jti digest", digest_keys)):
+        used_memory = await measure(redis, keys)
+        print(
+            f"{name}: key length {len(keys[0])} B, "
+            f"{used_memory / 2 ** 20:.1f} MiB total, "
+            f"{used_memory / tokens:.1f} B per token"
+        )
+    await redis.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=2_000_000)
+    parser.add_argument("--database", type=int, default=15)
+    arguments = parser.parse_args()
+    asyncio.run(run(arguments.tokens, arguments.database))
+
+
+if __name__ == "__main__":
+    main()
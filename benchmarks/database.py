@@ -0,0 +1,46 @@
+"""
+Throwaway databases for the benchmarks, created on the configured
+Postgres server with the tables of the models, and dropped afterwards.
+"""
+from contextlib import asynccontextmanager
+from secrets import token_hex
+from typing import AsyncIterator
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.database.engine import create_engine
+from src.models import BaseModel
+from src.settings import settings
+
+
+@asynccontextmanager
+async def temporary_database(name: str) -> AsyncIterator[AsyncEngine]:
+    """
+    Returns: An engine connected to a new database, whose name
+             is the configured one's suffixed with the given name.
+    """
+    server_url = make_url(settings.POSTGRES_DATABASE_URI)
+    database = f"{server_url.database}_{name}_{token_hex(4)}"
+    # Databases can't be created within a transaction.
+    server_engine = create_engine(
+        server_url.set(database="postgres").render_as_string(hide_password=False),
+        f"{name}-server"
+    ).execution_options(isolation_level="AUTOCOMMIT")
+    async with server_engine.connect() as connection:
+        await connection.execute(text(f'CREATE DATABASE "{database}"'))
+
+    engine = create_engine(
+        server_url.set(database=database).render_as_string(hide_password=False),
+        name
+    )
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(BaseModel.metadata.create_all)
+        yield engine
+    finally:
+        await engine.dispose()
+        async with server_engine.connect() as connection:
+            await connection.execute(text(f'DROP DATABASE IF EXISTS "{database}" WITH (FORCE)'))
+        await server_engine.dispose()
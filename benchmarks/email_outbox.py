@@ -0,0 +1,125 @@
+"""
+Sends emails to a local aiosmtpd server, first directly, opening a
+connection per email as the request path used to, then through the
+outbox and the sender pool: the time a request waits for each email,
+and the number of emails sent per second.
+
+Usage:
+  python -m benchmarks.email_outbox [--emails 1000] [--connections 2]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiosmtplib
+from aiosmtpd.controller import Controller
+from aiosmtpd.handlers import Sink
+
+from src.database.redis import redis
+from src.emails import EmailOutbox, EmailSender, OutboxMessage, templates
+from src.settings import settings
+
+
+HOSTNAME = "127.0.0.1"
+PORT = 8025
+
+
+class CountingSink(Sink):
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope) -> str:
+        self.received += 1
+        return "250 OK"
+
+
+def create_message(index: int) -> OutboxMessage:
+    return OutboxMessage(
+        f"user-{index}@example.com",
+        "Your multi-factor authentication token",
+        "mfa_message.txt",
+        {"user": {"first_name": "Benchmark", "last_name": str(index)}, "jwt": "jwt"}
+    )
+
+
+def create_connection() -> aiosmtplib.SMTP:
+    return aiosmtplib.SMTP(hostname=HOSTNAME, port=PORT, start_tls=False)
+
+
+def summarise(name: str, latencies: list[float], elapsed: float) -> None:
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    p50, p99 = percentiles[49], percentiles[98]
+    print(
+        f"{name}: request wait p50 {p50 * 1000:.2f} ms, p99 {p99 * 1000:.2f} ms, "
+        f"{len(latencies) / elapsed:.0f} emails/s"
+    )
+
+
+async def send_directly(sender: EmailSender, emails: int) -> None:
+    latencies = []
+    started_at = time.perf_counter()
+    for index in range(emails):
+        request_started_at = time.perf_counter()
+        connection = create_connection()
+        async with connection:
+            await connection.send_message(sender._render(create_message(index)))  # noqa
+        latencies.append(time.perf_counter() - request_started_at)
+    summarise("connection per email", latencies, time.perf_counter() - started_at)
+
+
+async def send_through_outbox(outbox: EmailOutbox,
+                              sender: EmailSender,
+                              sink: CountingSink,
+                              emails: int) -> None:
+    latencies = []
+    received_before = sink.received
+    started_at = time.perf_counter()
+    sender.start()
+    for index in range(emails):
+        request_started_at = time.perf_counter()
+        await outbox.enqueue(create_message(index))
+        latencies.append(time.perf_counter() - request_started_at)
+    while sink.received - received_before < emails:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started_at
+    await sender.stop()
+    summarise("outbox and sender pool", latencies, elapsed)
+
+
+async def run(emails: int, connections: int) -> None:
+    sink = CountingSink()
+    controller = Controller(sink, hostname=HOSTNAME, port=PORT)
+    controller.start()
+
+    outbox = EmailOutbox(redis, settings.EMAIL_OUTBOX_MAX_LENGTH, namespace="benchmark:emails")
+    sender = EmailSender(
+        outbox,
+        templates,
+        settings.MAIL_FROM,
+        connections,
+        settings.EMAIL_SENDER_BATCH_SIZE,
+        settings.EMAIL_SENDER_MAX_ATTEMPTS,
+        settings.EMAIL_SENDER_RETRY_DELAY,
+        settings.EMAIL_SENDER_CLAIM_IDLE_TIME,
+        connection_factory=create_connection
+    )
+    try:
+        await send_directly(sender, emails)
+        await send_through_outbox(outbox, sender, sink, emails)
+    finally:
+        controller.stop()
+        await redis.delete(outbox.stream, outbox.retries, outbox.dead_letters)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--emails", type=int, default=1000)
+    parser.add_argument("--connections", type=int, default=2)
+    arguments = parser.parse_args()
+
+    asyncio.run(run(arguments.emails, arguments.connections))
+
+
+if __name__ == "__main__":
+    main()
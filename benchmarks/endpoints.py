@@ -0,0 +1,286 @@
+"""
+Drives every authentication endpoint in-process, through the ASGI
+transport of httpx, against a throwaway database created on the
+configured Postgres server, and the configured Redis (preferably a
+spare database, through REDIS_DATABASE).
+
+Each endpoint is a phase: every user goes through it, by 'concurrency'
+clients at a time, before the next phase starts. The multi-factor
+authentication tokens a user would receive by email are created
+directly. For each phase, the throughput, the latency percentiles and
+the CPU time per request, including the password hashing processes
+(on Linux), are reported.
+
+The results can be saved as JSON, and compared with a saved baseline:
+a phase regresses if its throughput drops, or its p95 latency or CPU
+time per request grows, by more than the tolerance. The exit status is
+1 if any phase has regressed.
+
+Usage:
+  python -m benchmarks.endpoints [--users 200] [--concurrency 16]
+                                 [--save results.json]
+                                 [--baseline baseline.json] [--tolerance 0.1]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+from secrets import token_hex
+from typing import Callable
+
+import httpx
+
+from benchmarks.database import temporary_database
+from src.api.dependencies import blacklist
+from src.database.session import AsyncSession
+from src.main import application
+from src.security import password
+from src.security.jwt import JWTMission, create_jwt
+from src.security.jwt.generations import generations
+from src.services.user_cache import user_cache
+from src.settings import settings
+
+
+PASSWORD = "Benchmark-password-1"
+NEW_PASSWORD = "Benchmark-password-2"
+
+
+@dataclass
+class PhaseResult:
+    requests: int
+    errors: int
+    throughput: float
+    p50: float
+    p95: float
+    p99: float
+    cpu_per_request: float
+
+
+@dataclass
+class BenchmarkUser:
+    email_address: str
+    id: int | None = None
+    access_token: str | None = None
+
+
+def get_cpu_time() -> float:
+    """
+    Returns: The CPU time of this process and, on Linux, of its live
+             children, i.e. the password hashing processes, in seconds.
+    """
+    cpu_time = time.process_time()
+    ticks_per_second = os.sysconf("SC_CLK_TCK")
+    for child in multiprocessing.active_children():
+        try:
+            with open(f"/proc/{child.pid}/stat") as file:
+                fields = file.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        # The user and system times are the 14th and 15th fields.
+        cpu_time += (int(fields[11]) + int(fields[12])) / ticks_per_second
+    return cpu_time
+
+
+async def run_phase(users: list[BenchmarkUser],
+                    concurrency: int,
+                    request: Callable) -> PhaseResult:
+    latencies = []
+    errors = 0
+    queue = list(reversed(users))
+
+    async def client() -> None:
+        nonlocal errors
+        while queue:
+            user = queue.pop()
+            started_at = time.perf_counter()
+            response = await request(user)
+            latencies.append(time.perf_counter() - started_at)
+            if not response.is_success:
+                errors += 1
+
+    cpu_time = get_cpu_time()
+    started_at = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+    cpu_time = get_cpu_time() - cpu_time
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return PhaseResult(
+        requests=len(latencies),
+        errors=errors,
+        throughput=len(latencies) / elapsed,
+        p50=percentiles[49],
+        p95=percentiles[94],
+        p99=percentiles[98],
+        cpu_per_request=cpu_time / len(latencies)
+    )
+
+
+def create_phases(client: httpx.AsyncClient) -> dict[str, Callable]:
+    def mfa_token(user: BenchmarkUser, mission: JWTMission) -> str:
+        # Stands in for the token the user would receive by email.
+        return create_jwt(str(user.id), mission, timedelta(minutes=10))
+
+    async def create_user(user: BenchmarkUser) -> httpx.Response:
+        response = await client.post("/auth/create-user", json={
+            "first_name": "Benchmark",
+            "last_name": "User",
+            "email_address": user.email_address,
+            "password": PASSWORD
+        })
+        if response.is_success:
+            user.id = response.json()["id"]
+        return response
+
+    async def request_mfa_token(user: BenchmarkUser) -> httpx.Response:
+        return await client.post(
+            "/auth/request-multi-factor-authentication-token",
+            params={"mission": JWTMission.REGISTRATION_CONFIRMATION.value},
+            json=user.email_address
+        )
+
+    async def confirm_user(user: BenchmarkUser) -> httpx.Response:
+        return await client.post(
+            "/auth/confirm-user",
+            json={"jwt": mfa_token(user, JWTMission.REGISTRATION_CONFIRMATION)}
+        )
+
+    async def receive_access_token(user: BenchmarkUser) -> httpx.Response:
+        response = await client.post("/auth/receive-access-token", json={
+            "email_address": user.email_address,
+            "password": PASSWORD
+        })
+        if response.is_success:
+            user.access_token = response.json()["access_token"]
+        return response
+
+    async def logout_everywhere(user: BenchmarkUser) -> httpx.Response:
+        return await client.post(
+            "/auth/logout-everywhere",
+            headers={"Authorization": f"Bearer {user.access_token}"}
+        )
+
+    async def recover_password(user: BenchmarkUser) -> httpx.Response:
+        return await client.post("/auth/recover-password", json={
+            "new_password": NEW_PASSWORD,
+            "jwt": mfa_token(user, JWTMission.RECOVER_PASSWORD)
+        })
+
+    async def delete_user(user: BenchmarkUser) -> httpx.Response:
+        return await client.post(
+            "/auth/delete-user",
+            json={"jwt": mfa_token(user, JWTMission.CONFIRM_USER_DELETION)}
+        )
+
+    return {
+        "create-user": create_user,
+        "request-multi-factor-authentication-token": request_mfa_token,
+        "confirm-user": confirm_user,
+        "receive-access-token": receive_access_token,
+        "logout-everywhere": logout_everywhere,
+        "recover-password": recover_password,
+        "delete-user": delete_user
+    }
+
+
+async def run(users: int, concurrency: int) -> dict[str, PhaseResult]:
+    async with temporary_database("benchmark") as engine:
+        AsyncSession.configure(bind=engine)
+        # Every request comes from the same client, which would be rate limited.
+        settings.RATE_LIMITING_ENABLED = False
+
+        blacklist.start()
+        user_cache.start()
+        generations.start()
+        try:
+            # Starts the password hashing processes, so that it isn't measured.
+            await asyncio.gather(*(password.hash_password(PASSWORD) for _ in range(concurrency)))
+            benchmark_users = [
+                BenchmarkUser(f"benchmark-{token_hex(6)}@example.com") for _ in range(users)
+            ]
+            results = {}
+            transport = httpx.ASGITransport(app=application)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+                for name, request in create_phases(client).items():
+                    results[name] = await run_phase(benchmark_users, concurrency, request)
+            return results
+        finally:
+            await blacklist.stop()
+            await user_cache.stop()
+            await generations.stop()
+            password.hasher.shutdown()
+
+
+def compare(results: dict[str, PhaseResult],
+            baseline: dict[str, dict],
+            tolerance: float) -> list[str]:
+    """
+    Returns: The descriptions of the regressions.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        previous = PhaseResult(**baseline[name])
+        if result.throughput < previous.throughput * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {previous.throughput:.1f} -> {result.throughput:.1f} req/s"
+            )
+        if result.p95 > previous.p95 * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {previous.p95 * 1000:.1f} -> {result.p95 * 1000:.1f} ms"
+            )
+        if result.cpu_per_request > previous.cpu_per_request * (1 + tolerance):
+            regressions.append(
+                f"{name}: CPU {previous.cpu_per_request * 1000:.2f} -> "
+                f"{result.cpu_per_request * 1000:.2f} ms/req"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--save", help="The file to save the results to.")
+    parser.add_argument("--baseline", help="The file of the results to compare with.")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    arguments = parser.parse_args()
+
+    results = asyncio.run(run(arguments.users, arguments.concurrency))
+
+    print(f"{'endpoint':<45}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'CPU ms/req':>12}{'errors':>8}")
+    for name, result in results.items():
+        print(
+            f"{name:<45}{result.throughput:>9.1f}{result.p50 * 1000:>9.1f}"
+            f"{result.p95 * 1000:>9.1f}{result.p99 * 1000:>9.1f}"
+            f"{result.cpu_per_request * 1000:>12.2f}{result.errors:>8}"
+        )
+
+    if arguments.save:
+        with open(arguments.save, "w") as file:
+            json.dump({
+                "users": arguments.users,
+                "concurrency": arguments.concurrency,
+                "results": {name: asdict(result) for name, result in results.items()}
+            }, file, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline["results"], arguments.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compares the number of JSON Web Tokens decoded per second by the
+previous path (jose and a pydantic claims model) and the current one
+(HS256 fast path and the slotted claims class), with the claims cache
+disabled.
+
+Usage:
+  python -m benchmarks.jwt_decode [--tokens 1000] [--rounds 20]
+"""
+import argparse
+import time
+from datetime import timedelta
+
+import pydantic
+from jose.jwt import decode
+
+from src.schemas import JWTClaims
+from src.security.jwt import JWTMission, create_jwt, serialization
+from src.settings import settings
+
+
+class PydanticJWTClaims(pydantic.BaseModel):
+    sub: int
+    exp: int
+    mission: str
+    jti: str | None = None
+
+
+def decode_previously(jwt: str) -> PydanticJWTClaims:
+    return PydanticJWTClaims(
+        **decode(jwt, settings.SECRET_TOKEN, settings.JWT_ALGORITHM)
+    )
+
+
+def decode_currently(jwt: str) -> JWTClaims:
+    serialization.claims_cache.clear()
+    return serialization.decode_jwt(jwt)
+
+
+def measure(function, tokens: list[str], rounds: int) -> float:
+    """
+    Returns: The number of tokens decoded per second.
+    """
+    started_at = time.perf_counter()
+    for _ in range(rounds):
+        for token in tokens:
+            function(token)
+    return len(tokens) * rounds / (time.perf_counter() - started_at)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    arguments = parser.parse_args()
+
+    tokens = [
+        create_jwt(str(index), JWTMission.ACCESS_TOKEN, timedelta(hours=1))
+        for index in range(arguments.tokens)
+    ]
+    key = serialization._get_hs256_key(settings.SECRET_TOKEN)  # noqa
+    if key is None or serialization._decode_hs256(tokens[0], key) is None:  # noqa
+        raise SystemExit("The fast path doesn't apply to these tokens.")
+
+    previous = measure(decode_previously, tokens, arguments.rounds)
+    current = measure(decode_currently, tokens, arguments.rounds)
+    print(f"jose + pydantic: {previous:.0f} tokens/s")
+    print(f"fast path + slotted claims: {current:.0f} tokens/s ({current / previous:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Measures the overhead of the metrics: the time the middleware adds to a
+request on a trivial route, called straight through ASGI so that no
+network or client time blurs it, and the time the timed decorator adds
+to a function call.
+
+Usage:
+  python -m benchmarks.metrics_overhead [--requests 20000] [--calls 1000000]
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+from prometheus_client import Histogram
+
+from src.metrics import MetricsMiddleware, timed
+
+
+BENCHMARK_SECONDS = Histogram("benchmark_seconds", "The benchmark timer.")
+
+
+def create_application(with_metrics: bool) -> FastAPI:
+    application = FastAPI()
+    if with_metrics:
+        application.add_middleware(MetricsMiddleware)
+
+    @application.get("/users/{user_id}")
+    async def read_user(user_id: int) -> dict:
+        return {"id": user_id}
+
+    return application
+
+
+async def measure_requests(application: FastAPI, requests: int) -> float:
+    """
+    Returns: The average number of microseconds per request.
+    """
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        pass
+
+    def create_scope(index: int) -> dict:
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": f"/users/{index}",
+            "raw_path": f"/users/{index}".encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"benchmark")],
+            "client": ("127.0.0.1", 1),
+            "server": ("benchmark", 80)
+        }
+
+    # Builds the middleware stack before the measurement.
+    await application(create_scope(0), receive, send)
+    started_at = time.perf_counter()
+    for index in range(requests):
+        await application(create_scope(index), receive, send)
+    return (time.perf_counter() - started_at) / requests * 1e6
+
+
+def measure_calls(function, calls: int) -> float:
+    """
+    Returns: The average number of nanoseconds per call.
+    """
+    started_at = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - started_at) / calls * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--calls", type=int, default=1000000)
+    arguments = parser.parse_args()
+
+    without_metrics = asyncio.run(
+        measure_requests(create_application(False), arguments.requests)
+    )
+    with_metrics = asyncio.run(
+        measure_requests(create_application(True), arguments.requests)
+    )
+    print(
+        f"request: {without_metrics:.1f} us without metrics, {with_metrics:.1f} us with "
+        f"metrics (+{with_metrics - without_metrics:.1f} us)"
+    )
+
+    def bare() -> None:
+        pass
+
+    bare_call = measure_calls(bare, arguments.calls)
+    timed_call = measure_calls(timed(BENCHMARK_SECONDS)(bare), arguments.calls)
+    print(
+        f"call: {bare_call:.0f} ns bare, {timed_call:.0f} ns timed "
+        f"(+{timed_call - bare_call:.0f} ns)"
+    )
+
+
+if __name__ == "__main__":
+    main()
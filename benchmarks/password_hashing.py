@@ -0,0 +1,94 @@
+"""
+Measures how a login storm affects the latency of unrelated requests
+served by the same event loop.
+
+A probe coroutine stands in for a trivial endpoint: it wakes up every
+few milliseconds and records how late it was scheduled. Meanwhile,
+many concurrent logins verify a bcrypt password, either directly on
+the event loop or through the process pool.
+
+Usage:
+  python -m benchmarks.password_hashing [--logins 64] [--concurrency 16]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from src.security import password
+
+
+PROBE_INTERVAL = 0.005
+
+
+async def probe(stop: asyncio.Event, latencies: list[float]) -> None:
+    while not stop.is_set():
+        started_at = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        latencies.append(time.perf_counter() - started_at - PROBE_INTERVAL)
+
+
+async def login_storm(logins: int,
+                      concurrency: int,
+                      hashed_password: str,
+                      use_pool: bool) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login() -> None:
+        async with semaphore:
+            if use_pool:
+                await password.verify_password("Password123", hashed_password)
+            else:
+                password.check_password("Password123", hashed_password)
+                # Yield, as a real handler would while awaiting the database.
+                await asyncio.sleep(0)
+
+    await asyncio.gather(*(login() for _ in range(logins)))
+
+
+async def run(logins: int, concurrency: int, use_pool: bool) -> dict:
+    hashed_password = password.get_hashed_password("Password123")
+    if use_pool:
+        # Warm the pool up, so that spawning workers isn't measured.
+        await password.verify_password("Password123", hashed_password)
+
+    stop = asyncio.Event()
+    latencies = []
+    probe_task = asyncio.create_task(probe(stop, latencies))
+
+    started_at = time.perf_counter()
+    await login_storm(logins, concurrency, hashed_password, use_pool)
+    elapsed = time.perf_counter() - started_at
+
+    stop.set()
+    await probe_task
+
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "mode": "process pool" if use_pool else "event loop",
+        "logins/s": logins / elapsed,
+        "probe p50, ms": quantiles[49] * 1000,
+        "probe p99, ms": quantiles[98] * 1000,
+        "probe max, ms": max(latencies) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    arguments = parser.parse_args()
+
+    for use_pool in (False, True):
+        result = asyncio.run(
+            run(arguments.logins, arguments.concurrency, use_pool)
+        )
+        print(", ".join(
+            f"{key}: {value:.1f}" if isinstance(value, float) else f"{key}: {value}"
+            for key, value in result.items()
+        ))
+    password.hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
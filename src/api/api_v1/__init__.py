@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from src.api.api_v1.endpoints import auth
+from src.api.api_v1.endpoints import auth, introspection, jwks
 
 
 api_router = APIRouter()
@@ -10,3 +10,12 @@ api_router.include_router(
     prefix="/auth",
     tags=["users"]
 )
+api_router.include_router(
+    introspection.router,
+    prefix="/auth",
+    tags=["tokens"]
+)
+api_router.include_router(
+    jwks.router,
+    tags=["keys"]
+)
@@ -5,8 +5,10 @@ from src import schemas
 from src.api import dependencies
 from src.emails import send_multi_factor_authentication_jwt
 from src.models import User
-from src.security import jwt, password
+from src.security import jwt
+from src.security.jwt.generations import generations
 from src.services import users
+from src.services.mfa_throttle import mfa_throttle
 from src.settings import settings
 
 
@@ -15,7 +17,13 @@ router = fastapi.APIRouter()
 
 @router.post(
     "/request-multi-factor-authentication-token",
-    response_model=schemas.ResponseMessage
+    response_model=schemas.ResponseMessage,
+    dependencies=[fastapi.Depends(dependencies.RateLimit(
+        "mfa-token",
+        per_ip=settings.RATE_LIMIT_MFA_TOKEN_PER_IP,
+        per_email_address=settings.RATE_LIMIT_MFA_TOKEN_PER_EMAIL,
+        globally=settings.RATE_LIMIT_MFA_TOKEN_GLOBAL
+    ))]
 )
 async def send_mfa_token(
     mission: jwt.JWTMission,
@@ -29,12 +37,19 @@ async def send_mfa_token(
             "The user with this email address doesn't exist."
         )
 
-    json_web_token = jwt.create_jwt(
-        str(user.id),
-        mission,
-        settings.MFA_TOKEN_LIFETIME
-    )
-    await send_multi_factor_authentication_jwt(user, json_web_token)
+    # A suppressed request looks the same to the client, as
+    # the previously sent token is still valid.
+    if await mfa_throttle.acquire(user.id, mission.value):
+        json_web_token = jwt.create_jwt(
+            str(user.id),
+            mission,
+            settings.MFA_TOKEN_LIFETIME
+        )
+        try:
+            await send_multi_factor_authentication_jwt(user, json_web_token)
+        except Exception:
+            await mfa_throttle.release(user.id, mission.value)
+            raise
 
     return {"message": "A multi-factor authentication token has been sent."}
 
@@ -47,18 +62,24 @@ async def create_user(
     user: schemas.UserCreationSchema,
     db_session: AsyncSession = fastapi.Depends(dependencies.get_database_session)
 ):
-    if await users.get_user_by_email_address(db_session, user.email_address):
+    new_user = await users.create_user(db_session, user)
+    if new_user is None:
         raise fastapi.HTTPException(
             fastapi.status.HTTP_400_BAD_REQUEST,
             "The chosen username is already taken."
         )
-    new_user = await users.create_user(db_session, user)
     return new_user
 
 
 @router.post(
     "/receive-access-token",
-    response_model=schemas.ResponseAccessToken
+    response_model=schemas.ResponseAccessToken,
+    dependencies=[fastapi.Depends(dependencies.RateLimit(
+        "access-token",
+        per_ip=settings.RATE_LIMIT_ACCESS_TOKEN_PER_IP,
+        per_email_address=settings.RATE_LIMIT_ACCESS_TOKEN_PER_EMAIL,
+        globally=settings.RATE_LIMIT_ACCESS_TOKEN_GLOBAL
+    ))]
 )
 async def provide_access_token(
     credentials: schemas.Credentials,
@@ -71,10 +92,12 @@ async def provide_access_token(
             "The credentials are invalid."
         )
 
+    # The generation may have just been bumped by another process.
     access_token = jwt.create_jwt(
         str(user.id),
         jwt.JWTMission.ACCESS_TOKEN,
-        settings.ACCESS_TOKEN_LIFETIME
+        settings.ACCESS_TOKEN_LIFETIME,
+        generation=await generations.get(user.id, cached=False)
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -86,8 +109,7 @@ async def confirm_user(
     ),
     db_session: AsyncSession = fastapi.Depends(dependencies.get_database_session)
 ):
-    user.is_confirmed = True
-    await db_session.commit()
+    await users.confirm_user(db_session, user)
     return {"message": "The user has been confirmed successfully."}
 
 
@@ -102,8 +124,7 @@ async def recover_password(
     ),
     db_session: AsyncSession = fastapi.Depends(dependencies.get_database_session)
 ):
-    user.password = password.get_hashed_password(new_password)
-    await db_session.commit()
+    await users.change_password(db_session, user, new_password)
     return {"message": "The password has been changed successfully."}
 
 
@@ -117,6 +138,18 @@ async def delete_user(
     ),
     db_session: AsyncSession = fastapi.Depends(dependencies.get_database_session)
 ):
-    await db_session.delete(user)
-    await db_session.commit()
+    await users.delete_user(db_session, user)
     return {"message": "The user has been deleted successfully."}
+
+
+@router.post(
+    "/logout-everywhere",
+    response_model=schemas.ResponseMessage
+)
+async def logout_everywhere(
+    user: schemas.UserSnapshot = fastapi.Depends(
+        dependencies.JWTAuthenticationUser(jwt.JWTMission.ACCESS_TOKEN)
+    )
+):
+    await users.revoke_access_tokens(user.id)
+    return {"message": "Every access token of the user has been revoked."}
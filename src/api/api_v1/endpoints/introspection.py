@@ -0,0 +1,98 @@
+import fastapi
+from jose.jwt import JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src import schemas
+from src.api import dependencies
+from src.security import jwt
+from src.security.jwt.generations import generations
+from src.services import users
+
+
+router = fastapi.APIRouter()
+
+
+@router.post(
+    "/introspect",
+    response_model=schemas.IntrospectionResponse,
+    response_model_exclude_none=True,
+    dependencies=[fastapi.Depends(dependencies.verify_introspection_client)]
+)
+async def introspect_tokens(
+    introspection: schemas.IntrospectionRequest,
+    db_session: AsyncSession = fastapi.Depends(dependencies.get_database_session)
+):
+    """
+    Tells which of a batch of JSON Web Tokens are active, in the manner
+    of RFC 7662, for services such as API gateways, with their claims
+    and, optionally, their users.
+
+    A token is active if it's valid, isn't blacklisted and, for access
+    tokens, belongs to the current generation of its user. All the tokens
+    are checked against the blacklist in a single backend request, and the
+    users are read by a single query.
+    """
+    claims_by_index = {}
+    for index, token in enumerate(introspection.tokens):
+        try:
+            claims_by_index[index] = jwt.decode_jwt(token)
+        except (JWTError, schemas.InvalidJWTClaims):
+            pass
+
+    are_blocked = await dependencies.blacklist.are_blocked([
+        (introspection.tokens[index], claims.jti)
+        for index, claims in claims_by_index.items()
+    ])
+    claims_by_index = {
+        index: claims
+        for (index, claims), is_blocked in zip(claims_by_index.items(), are_blocked)
+        if not is_blocked
+    }
+
+    access_token_claims = [
+        claims for claims in claims_by_index.values()
+        if claims.mission == jwt.JWTMission.ACCESS_TOKEN
+    ]
+    if access_token_claims:
+        current_generations = await generations.get_many(
+            claims.sub for claims in access_token_claims
+        )
+        claims_by_index = {
+            index: claims
+            for index, claims in claims_by_index.items()
+            if claims.mission != jwt.JWTMission.ACCESS_TOKEN
+            or (claims.gen or 0) == current_generations[claims.sub]
+        }
+
+    user_snapshots = None
+    if introspection.include_users and claims_by_index:
+        user_snapshots = await users.get_user_snapshots(
+            db_session, (claims.sub for claims in claims_by_index.values())
+        )
+
+    results = []
+    for index in range(len(introspection.tokens)):
+        claims = claims_by_index.get(index)
+        if claims is None:
+            results.append(schemas.IntrospectionResult(active=False))
+            continue
+
+        user = None
+        if user_snapshots is not None:
+            snapshot = user_snapshots.get(claims.sub)
+            # The user may have been deleted, or be yet unconfirmed.
+            if snapshot is None or not snapshot.is_confirmed:
+                results.append(schemas.IntrospectionResult(active=False))
+                continue
+            user = schemas.UserDisplaySchema.from_orm(snapshot)
+
+        results.append(schemas.IntrospectionResult(
+            active=True,
+            sub=str(claims.sub),
+            exp=claims.exp,
+            mission=claims.mission,
+            jti=claims.jti,
+            gen=claims.gen,
+            user=user
+        ))
+    return {"results": results}
@@ -0,0 +1,31 @@
+import fastapi
+
+from src.security.jwt.keys import keyring
+from src.settings import settings
+
+
+router = fastapi.APIRouter()
+
+
+@router.get("/.well-known/jwks.json")
+async def get_jwks(request: fastapi.Request) -> fastapi.Response:
+    """
+    Publishes the public keys verifying access tokens, so that other
+    services can verify them locally. Symmetric keys aren't published,
+    so the set is empty if JSON Web Tokens are signed with HS256.
+    """
+    if keyring is None:
+        document, etag = b'{"keys":[]}', '"empty"'
+    else:
+        document, etag = keyring.get_jwks_document()
+
+    headers = {
+        "Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE}",
+        "ETag": etag
+    }
+    if request.headers.get("If-None-Match") == etag:
+        return fastapi.Response(
+            status_code=fastapi.status.HTTP_304_NOT_MODIFIED,
+            headers=headers
+        )
+    return fastapi.Response(document, media_type="application/json", headers=headers)
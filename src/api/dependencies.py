@@ -1,18 +1,22 @@
+import hmac
+import math
 from abc import abstractmethod
 from typing import Generator, Any
 
 import fastapi
-from aioredis import StrictRedis
-from fastapi.security import OAuth2PasswordBearer
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer, OAuth2PasswordBearer
 from jose.jwt import JWTError
-from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession as AlchemyAsyncSession
 
+from src.database.engine import engine
+from src.database.redis import redis
 from src.database.session import AsyncSession
 from src.models import User
-from src.schemas import JWTClaims
+from src.schemas import JWTClaims, InvalidJWTClaims, UserSnapshot
 from src.security import jwt as jwt_package
+from src.security.jwt.generations import generations
 from src.services import users
+from src.services.rate_limiter import Rate, rate_limiter
 from src.settings import settings
 
 
@@ -21,13 +25,34 @@ async def get_database_session() -> Generator:
         yield session
 
 
-blacklist = jwt_package.JWTBlacklist(
-    StrictRedis(
-        host=settings.REDIS_HOST,
-        port=settings.REDIS_PORT,
-        db=settings.REDIS_DATABASE,
-        password=settings.REDIS_PASSWORD
+def create_blacklist_backend() -> jwt_package.JWTBlacklistBackend:
+    """
+    Returns: The blacklist backend chosen by the settings.
+    """
+    if settings.JWT_BLACKLIST_BACKEND == "postgres":
+        return jwt_package.PostgresBlacklistBackend(engine)
+    if settings.JWT_BLACKLIST_BACKEND == "shared-memory":
+        return jwt_package.SharedMemoryBlacklistBackend(
+            settings.JWT_BLACKLIST_SHARED_MEMORY_PATH,
+            settings.JWT_BLACKLIST_SHARED_MEMORY_CAPACITY
+        )
+    return jwt_package.RedisBlacklistBackend(
+        redis,
+        blacklist_filter=jwt_package.JWTBlacklistFilter(
+            redis,
+            jwt_package.JWTBlacklist.namespace,
+            false_positive_rate=settings.JWT_BLACKLIST_FILTER_FALSE_POSITIVE_RATE,
+            max_size=settings.JWT_BLACKLIST_FILTER_MAX_SIZE,
+            rebuild_interval=settings.JWT_BLACKLIST_FILTER_REBUILD_INTERVAL
+        ) if settings.JWT_BLACKLIST_FILTER_ENABLED else None
     )
+
+
+blacklist_backend = create_blacklist_backend()
+blacklist = jwt_package.JWTBlacklist(
+    blacklist_backend,
+    batch_max_size=settings.JWT_BLACKLIST_BATCH_MAX_SIZE,
+    batch_max_wait=settings.JWT_BLACKLIST_BATCH_MAX_WAIT
 )
 
 
@@ -53,6 +78,18 @@ class JWTProcessor:
             "The given JSON Web Token is invalid."
         )
 
+    async def is_valid(self, jwt: str, claims: JWTClaims) -> bool:
+        """
+        Returns: A Boolean value designating whether the JSON Web Token,
+                 whose signature and claims have been checked, may be used.
+                 By default, it mustn't be blacklisted.
+        """
+        if self._add_to_blacklist:
+            # Checking and blacklisting must be a single operation,
+            # otherwise concurrent requests could both use the token.
+            return await blacklist.consume(jwt, claims.exp, claims.jti)
+        return not await blacklist.is_blocked(jwt, claims.jti)
+
     @abstractmethod
     async def process_claims(self,
                              claims: JWTClaims,
@@ -82,25 +119,27 @@ class JWTProcessor:
         """
         try:
             claims = jwt_package.decode_jwt(jwt)
-        except (JWTError, ValidationError):
+        except (JWTError, InvalidJWTClaims):
             raise self._exception
 
-        if (
-            claims.mission != self._mission or
-            await blacklist.is_blocked(jwt)
-        ):
+        if claims.mission != self._mission:
             raise self._exception
 
-        if self._add_to_blacklist:
-            await blacklist.block(jwt, claims.exp)
+        if not await self.is_valid(jwt, claims):
+            raise self._exception
 
         return await self.process_claims(claims, db_session)
 
 
 class JWTUser(JWTProcessor):
+    # If True, a cached read-only snapshot of the user is returned
+    # instead of the row, so it's only suitable for endpoints that
+    # don't change the user.
+    returns_snapshot = False
+
     async def process_claims(self,
                              claims: JWTClaims,
-                             db_session: AlchemyAsyncSession) -> User:
+                             db_session: AlchemyAsyncSession) -> User | UserSnapshot:
         """
         Returns:
           The JSON Web Token user referenced by the 'sub'.
@@ -108,7 +147,11 @@ class JWTUser(JWTProcessor):
         Raises:
           fastapi.HTTPException: If the user hasn't been found.
         """
-        user = await users.get_user_by_id(
+        get_user = (
+            users.get_user_snapshot if self.returns_snapshot
+            else users.get_user_by_id
+        )
+        user = await get_user(
             db_session,
             user_id=claims.sub
         )
@@ -123,7 +166,7 @@ class JWTUser(JWTProcessor):
 class JWTConfirmedUser(JWTUser):
     async def process_claims(self,
                              claims: JWTClaims,
-                             db_session: AlchemyAsyncSession) -> User:
+                             db_session: AlchemyAsyncSession) -> User | UserSnapshot:
         """
         Returns:
           The active JSON Web Token user referenced by the 'sub'.
@@ -141,13 +184,121 @@ class JWTConfirmedUser(JWTUser):
         return user
 
 
+class RateLimit:
+    def __init__(self,
+                 name: str,
+                 per_ip: str | None = None,
+                 per_email_address: str | None = None,
+                 globally: str | None = None):
+        """
+        Args:
+          name:
+            The name of the limited operation, whose
+            buckets are separate from other operations'.
+
+          per_ip, per_email_address, globally:
+            The rates, as "<requests>/<second|minute|hour|day>",
+            allowed per client IP address, per email address in the
+            request body, and for all clients. None disables a limit.
+        """
+        self._name = name
+        self._per_ip = Rate.parse(per_ip) if per_ip else None
+        self._per_email_address = Rate.parse(per_email_address) if per_email_address else None
+        self._globally = Rate.parse(globally) if globally else None
+
+    @staticmethod
+    async def _get_email_address(request: fastapi.Request) -> str | None:
+        # The body has already been read and validated for the endpoint,
+        # it's either the email address or an object holding it.
+        try:
+            body = await request.json()
+        except ValueError:
+            return None
+        if isinstance(body, dict):
+            body = body.get("email_address")
+        return body.lower() if isinstance(body, str) else None
+
+    async def __call__(self, request: fastapi.Request) -> None:
+        """
+        Raises:
+          fastapi.HTTPException:
+            If a limit has been exceeded, with the number of seconds
+            after which the request may be retried as 'Retry-After'.
+
+        Notes:
+          The client IP address is the peer's, so behind a proxy the
+          server must be trusted to rewrite it from X-Forwarded-For.
+        """
+        if not settings.RATE_LIMITING_ENABLED:
+            return
+
+        limits = {}
+        if self._per_ip is not None and request.client is not None:
+            limits[f"ip:{request.client.host}"] = self._per_ip
+        if self._per_email_address is not None:
+            email_address = await self._get_email_address(request)
+            if email_address is not None:
+                limits[f"email:{email_address}"] = self._per_email_address
+        if self._globally is not None:
+            limits["global"] = self._globally
+        if not limits:
+            return
+
+        delay = await rate_limiter.hit(self._name, limits)
+        if delay:
+            raise fastapi.HTTPException(
+                fastapi.status.HTTP_429_TOO_MANY_REQUESTS,
+                "Too many requests, retry later.",
+                headers={"Retry-After": str(math.ceil(delay))}
+            )
+
+
 oauth2 = OAuth2PasswordBearer(f"{settings.API_V1}/login-access-token")
+introspection_bearer = HTTPBearer(auto_error=False)
+
+
+async def verify_introspection_client(
+    credentials: HTTPAuthorizationCredentials | None = fastapi.Depends(introspection_bearer)
+) -> None:
+    """
+    Raises:
+      fastapi.HTTPException:
+        If introspection is disabled, or the
+        client hasn't presented the shared secret.
+    """
+    if settings.INTROSPECTION_SECRET is None:
+        raise fastapi.HTTPException(
+            fastapi.status.HTTP_404_NOT_FOUND,
+            "Token introspection is disabled."
+        )
+    if credentials is None or not hmac.compare_digest(
+        credentials.credentials.encode(), settings.INTROSPECTION_SECRET.encode()
+    ):
+        raise fastapi.HTTPException(
+            fastapi.status.HTTP_401_UNAUTHORIZED,
+            "The introspection client isn't authorized.",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
 
 
 class JWTAuthenticationUser(JWTConfirmedUser):
-    def __call__(
+    returns_snapshot = True
+
+    async def is_valid(self, jwt: str, claims: JWTClaims) -> bool:
+        """
+        Returns: A Boolean value designating whether the access token
+                 belongs to the current generation of its user.
+
+        Notes:
+          Access tokens are revoked per user, by bumping the generation,
+          rather than blacklisted one by one, which spares a blacklist lookup
+          per request. Those issued before generations count as the first.
+        """
+        return (claims.gen or 0) == await generations.get(claims.sub)
+
+    async def __call__(
         self,
         jwt: str = fastapi.Depends(oauth2),
         db_session: AlchemyAsyncSession = fastapi.Depends(get_database_session)
     ) -> Any:
-        super().__call__(jwt, db_session)
+        return await super().__call__(jwt, db_session)
@@ -1,6 +1,54 @@
-from sqlalchemy.ext.asyncio import create_async_engine
+import logging
 
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.metrics import InstrumentedPool, pool_collector
 from src.settings import settings
 
 
-engine = create_async_engine(settings.POSTGRES_DATABASE_URI, future=True, pool_pre_ping=True)
+logger = logging.getLogger(__name__)
+
+
+def create_engine(uri: str, name: str) -> AsyncEngine:
+    """
+    Returns: An engine pooling connections as configured by the settings,
+             with its pool statistics reported under the given name.
+    """
+    engine = create_async_engine(
+        uri,
+        future=True,
+        poolclass=InstrumentedPool,
+        pool_logging_name=name,
+        pool_size=settings.POSTGRES_POOL_SIZE,
+        max_overflow=settings.POSTGRES_MAX_OVERFLOW,
+        pool_timeout=settings.POSTGRES_POOL_TIMEOUT,
+        pool_recycle=settings.POSTGRES_POOL_RECYCLE,
+        pool_use_lifo=settings.POSTGRES_POOL_USE_LIFO,
+        pool_pre_ping=settings.POSTGRES_LIVENESS_CHECK == "pre-ping",
+        connect_args={
+            # The cache of SQLAlchemy's asyncpg adapter, and asyncpg's own.
+            "prepared_statement_cache_size": settings.POSTGRES_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": settings.POSTGRES_STATEMENT_CACHE_SIZE
+        }
+    )
+    pool_collector.register(name, engine)
+    return engine
+
+
+async def check_liveness(engine: AsyncEngine) -> None:
+    """
+    Replaces the pooled connections if the database can't be reached,
+    for the "periodic" liveness check. Otherwise, a failure is detected
+    by SQLAlchemy, which invalidates the pool, only once a statement
+    has failed.
+    """
+    try:
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+    except (exc.DBAPIError, OSError):
+        logger.warning("The database can't be reached, the pool is disposed.", exc_info=True)
+        await engine.dispose()
+
+
+engine = create_engine(settings.POSTGRES_DATABASE_URI, "primary")
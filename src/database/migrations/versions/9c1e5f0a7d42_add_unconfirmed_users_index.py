@@ -0,0 +1,36 @@
+"""
+add_unconfirmed_users_index
+
+Revision ID: 9c1e5f0a7d42
+Revises: 6b203021f988
+Create Date: 2026-10-18 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "9c1e5f0a7d42"
+down_revision = "6b203021f988"
+branch_labels = depends_on = None
+
+
+def upgrade() -> None:
+    # Built concurrently, so that sign-ups aren't blocked on a large table.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_user_created_at_unconfirmed',
+            'user',
+            ['created_at'],
+            unique=False,
+            postgresql_where=sa.text('is_confirmed = false'),
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_user_created_at_unconfirmed',
+            table_name='user',
+            postgresql_concurrently=True
+        )
@@ -0,0 +1,36 @@
+"""
+create_jwt_blacklist
+
+Revision ID: e4a7c2b9d315
+Revises: 9c1e5f0a7d42
+Create Date: 2026-10-18 15:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "e4a7c2b9d315"
+down_revision = "9c1e5f0a7d42"
+branch_labels = depends_on = None
+
+
+def upgrade() -> None:
+    # Unlogged, as a crash merely revives blacklisted tokens until they expire.
+    op.create_table(
+        'jwt_blacklist',
+        sa.Column('key', sa.LargeBinary(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+        prefixes=['UNLOGGED']
+    )
+    op.create_index(
+        op.f('ix_jwt_blacklist_expires_at'),
+        'jwt_blacklist',
+        ['expires_at'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_jwt_blacklist_expires_at'), table_name='jwt_blacklist')
+    op.drop_table('jwt_blacklist')
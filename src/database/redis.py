@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from aioredis import StrictRedis
+
+from src.settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+redis = StrictRedis(
+    host=settings.REDIS_HOST,
+    port=settings.REDIS_PORT,
+    db=settings.REDIS_DATABASE,
+    password=settings.REDIS_PASSWORD
+)
+
+
+class Subscription:
+    """
+    Listens to a Redis channel in a background task.
+
+    Messages published while the connection is down are lost,
+    so the subscriber is told whenever the subscription is
+    (re-)established or dropped, to resynchronise its state.
+    """
+
+    def __init__(self,
+                 redis_storage: StrictRedis,
+                 channel: str,
+                 on_message: Callable[[bytes], None],
+                 on_subscribe: Callable[[], Awaitable[None]] | None = None,
+                 on_unsubscribe: Callable[[], None] | None = None,
+                 retry_delay: float = 1):
+        """
+        Args:
+          on_message:
+            Called with the data of each published message.
+
+          on_subscribe:
+            Awaited each time the subscription is established,
+            before any message published since then is handled.
+
+          on_unsubscribe:
+            Called each time the subscription is dropped.
+
+          retry_delay:
+            The number of seconds to wait before resubscribing.
+        """
+        self._redis_storage = redis_storage
+        self._channel = channel
+        self._on_message = on_message
+        self._on_subscribe = on_subscribe
+        self._on_unsubscribe = on_unsubscribe
+        self._retry_delay = retry_delay
+
+        self._task: asyncio.Task | None = None
+        self.is_active = False
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self._redis_storage.pubsub()
+            try:
+                await pubsub.subscribe(self._channel)
+                self.is_active = True
+                if self._on_subscribe is not None:
+                    await self._on_subscribe()
+
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=1
+                    )
+                    if message is not None:
+                        self._on_message(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa
+                logger.warning(
+                    "The subscription to %r has been dropped.",
+                    self._channel,
+                    exc_info=True
+                )
+            finally:
+                self.is_active = False
+                if self._on_unsubscribe is not None:
+                    self._on_unsubscribe()
+                await pubsub.reset()
+
+            await asyncio.sleep(self._retry_delay)
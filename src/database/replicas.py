@@ -0,0 +1,92 @@
+import asyncio
+import logging
+from itertools import count
+from typing import TYPE_CHECKING
+
+from sqlalchemy import exc, text
+
+from src.database.engine import create_engine
+from src.metrics.database import REPLICA_HEALTHY
+from src.settings import settings
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaSet:
+    """
+    The read replicas of the primary database, handed out in turn.
+
+    Each replica is checked periodically, by each process, and only
+    those that have passed their last check are handed out. A replica
+    is presumed healthy until it's checked for the first time.
+    """
+
+    def __init__(self, engines: dict[str, "AsyncEngine"], check_timeout: float):
+        """
+        Args:
+          engines: The engines of the replicas by their pool names.
+          check_timeout: The number of seconds a health check may take.
+        """
+        self._engines = engines
+        self._check_timeout = check_timeout
+
+        self._healthy_engines = list(engines.values())
+        self._turns = count()
+        for name in engines:
+            REPLICA_HEALTHY.labels(name).set(1)
+
+    def choose(self) -> "AsyncEngine | None":
+        """
+        Returns: The engine of the next healthy replica, or None.
+        """
+        if not self._healthy_engines:
+            return None
+        return self._healthy_engines[next(self._turns) % len(self._healthy_engines)]
+
+    @staticmethod
+    async def _select_one(engine: "AsyncEngine") -> None:
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    async def _is_healthy(self, engine: "AsyncEngine") -> bool:
+        # The timeout covers connecting too, so that an unreachable
+        # replica doesn't hold the next checks back for its connect timeout.
+        try:
+            await asyncio.wait_for(self._select_one(engine), self._check_timeout)
+        except (exc.DBAPIError, OSError, asyncio.TimeoutError):
+            return False
+        return True
+
+    async def check_health(self) -> None:
+        names = list(self._engines)
+        results = await asyncio.gather(*(
+            self._is_healthy(engine) for engine in self._engines.values()
+        ))
+        healthy_engines = []
+        for name, is_healthy in zip(names, results):
+            engine = self._engines[name]
+            was_healthy = engine in self._healthy_engines
+            if is_healthy:
+                healthy_engines.append(engine)
+            if is_healthy != was_healthy:
+                logger.warning(
+                    "The replica %s is %s.", name, "back" if is_healthy else "unhealthy"
+                )
+            if not is_healthy:
+                # Its pooled connections are probably dead.
+                await engine.dispose()
+            REPLICA_HEALTHY.labels(name).set(int(is_healthy))
+        self._healthy_engines = healthy_engines
+
+
+replicas = ReplicaSet(
+    {
+        f"replica-{index}": create_engine(uri, f"replica-{index}")
+        for index, uri in enumerate(settings.POSTGRES_REPLICA_URIS)
+    },
+    settings.POSTGRES_REPLICA_CHECK_TIMEOUT
+)
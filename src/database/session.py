@@ -1,7 +1,46 @@
-from sqlalchemy.orm.session import sessionmaker
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.session import sessionmaker
+from sqlalchemy.sql.base import Executable
+from sqlalchemy.sql.dml import UpdateBase
 
 from src.database.engine import engine
+from src.database.replicas import replicas
+
+
+class RoutingSession(Session):
+    """
+    Sends the statements marked with the 'read_only' execution option
+    to a replica, and everything else to the primary.
+
+    A session sticks to the first replica it's given, and once it has
+    written anything, its reads go to the primary too, so that they
+    see its own writes despite the replication lag.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._has_written = False
+        self._replica = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self._has_written = True
+        elif (
+            not self._has_written
+            and isinstance(clause, Executable)
+            and clause.get_execution_options().get("read_only")
+        ):
+            if self._replica is None:
+                self._replica = replicas.choose()
+            if self._replica is not None:
+                return self._replica.sync_engine
+        return super().get_bind(mapper, clause, **kwargs)
 
 
-AsyncSession = sessionmaker(autoflush=True, class_=AsyncSession, bind=engine)
+AsyncSession = sessionmaker(
+    autoflush=True,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    bind=engine
+)
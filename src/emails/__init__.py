@@ -0,0 +1,4 @@
+from src.emails.messages import send_multi_factor_authentication_jwt
+from src.emails.outbox import EmailOutbox, EmailOutboxFull, OutboxMessage, outbox
+from src.emails.sender import EmailSender, sender
+from src.emails.templates import EmailTemplates, templates
@@ -0,0 +1,23 @@
+from typing import TYPE_CHECKING
+
+from src.emails.outbox import OutboxMessage, outbox
+
+if TYPE_CHECKING:
+    from src.models import User
+
+
+async def send_multi_factor_authentication_jwt(
+    user: "User",
+    jwt: str,
+    subject: str = "Your multi-factor authentication token",
+    template_name="mfa_message.txt"
+) -> None:
+    await outbox.enqueue(OutboxMessage(
+        user.email_address,
+        subject,
+        template_name,
+        {
+            "user": {"first_name": user.first_name, "last_name": user.last_name},
+            "jwt": jwt
+        }
+    ))
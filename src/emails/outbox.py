@@ -0,0 +1,202 @@
+import json
+from dataclasses import asdict, dataclass, field, replace
+from secrets import token_hex
+from typing import TYPE_CHECKING, Any
+
+from aioredis import ResponseError
+
+from src.database.redis import redis
+from src.settings import settings
+
+if TYPE_CHECKING:
+    from aioredis import Redis
+
+
+class EmailOutboxFull(Exception):
+    """
+    Raised when the stream already holds the maximum number of
+    messages, e.g. while the mail server is down, so the caller
+    should try again later.
+    """
+
+
+@dataclass(frozen=True)
+class OutboxMessage:
+    recipient: str
+    subject: str
+    template_name: str
+    context: dict[str, Any]
+    attempts: int = 0
+    # Keeps equal messages distinct in the retry queue.
+    id: str = field(default_factory=lambda: token_hex(8))
+
+    def dumps(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def loads(cls, document: str | bytes) -> "OutboxMessage":
+        return cls(**json.loads(document))
+
+    def retried(self) -> "OutboxMessage":
+        return replace(self, attempts=self.attempts + 1)
+
+
+class EmailOutbox:
+    """
+    Emails are sent in the background, so that requests don't wait for
+    the mail server, and don't fail when it's unavailable.
+
+    A request only appends the message to a Redis stream, which is read
+    by a consumer group of senders. A message is removed from the stream
+    once it's sent; a failed one is moved to a sorted set of retries,
+    scored by the time it's due, and back to the stream at that time,
+    or, after the last attempt, to a dead-letter stream.
+
+    The stream is never trimmed, as it would drop messages still queued
+    or pending. Instead, new messages are rejected while it's full.
+    Dead letters are kept until they're removed by an operator.
+
+    Notes:
+      A message stays pending until it's removed, so the messages
+      of a crashed sender are claimed by others after a while.
+      Thus, a message may be sent more than once, but it's never lost.
+    """
+
+    group = "email-senders"
+
+    # KEYS: stream. ARGV: stream max length, message.
+    _ENQUEUE_SCRIPT = """
+    if redis.call('XLEN', KEYS[1]) >= tonumber(ARGV[1]) then
+        return false
+    end
+    return redis.call('XADD', KEYS[1], '*', 'message', ARGV[2])
+    """
+
+    # KEYS: retries. ARGV: delay in seconds, message.
+    _RETRY_SCRIPT = """
+    local time = redis.call('TIME')
+    redis.call('ZADD', KEYS[1], time[1] + time[2] / 1000000 + ARGV[1], ARGV[2])
+    """
+    # KEYS: retries, stream. ARGV: count.
+    # Retries have been accepted already, so they're put back even if it's full.
+    _RELEASE_RETRIES_SCRIPT = """
+    local time = redis.call('TIME')
+    local now = time[1] + time[2] / 1000000
+    local messages = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, ARGV[1])
+    for _, message in ipairs(messages) do
+        redis.call('XADD', KEYS[2], '*', 'message', message)
+        redis.call('ZREM', KEYS[1], message)
+    end
+    return #messages
+    """
+
+    def __init__(self,
+                 redis_storage: "Redis",
+                 max_length: int,
+                 namespace: str = "emails"):
+        """
+        Args:
+          max_length:
+            The maximum number of messages held by the stream,
+            beyond which new messages are rejected.
+        """
+        self._redis_storage = redis_storage
+        self._max_length = max_length
+        self.stream = f"{namespace}:outbox"
+        self.retries = f"{namespace}:retries"
+        self.dead_letters = f"{namespace}:dead-letters"
+
+        self._enqueue = redis_storage.register_script(self._ENQUEUE_SCRIPT)
+        self._retry = redis_storage.register_script(self._RETRY_SCRIPT)
+        self._release_retries = redis_storage.register_script(
+            self._RELEASE_RETRIES_SCRIPT
+        )
+
+    async def enqueue(self, message: OutboxMessage) -> None:
+        """
+        Raises:
+          EmailOutboxFull: If the stream holds 'max_length' messages.
+        """
+        entry_id = await self._enqueue(
+            keys=[self.stream], args=[self._max_length, message.dumps()]
+        )
+        if entry_id is None:
+            raise EmailOutboxFull(f"The stream {self.stream} is full.")
+
+    async def create_group(self) -> None:
+        try:
+            await self._redis_storage.xgroup_create(
+                self.stream, self.group, id="0", mkstream=True
+            )
+        except ResponseError as exception:
+            if not str(exception).startswith("BUSYGROUP"):
+                raise
+
+    @staticmethod
+    def _parse(entries: list) -> list[tuple[bytes, OutboxMessage | None]]:
+        # The fields of an entry removed while it was pending are None.
+        return [
+            (entry_id, OutboxMessage.loads(fields[b"message"]) if fields else None)
+            for entry_id, fields in entries
+        ]
+
+    async def read(self,
+                   consumer: str,
+                   count: int,
+                   block: int) -> list[tuple[bytes, OutboxMessage | None]]:
+        """
+        Moves the retries which are due to the stream,
+        and reads the messages not delivered to any sender yet.
+
+        Args:
+          block: The number of milliseconds to wait for a message.
+
+        Returns: The stream entry identifiers, with their messages.
+        """
+        await self._release_retries(keys=[self.retries, self.stream], args=[count])
+        response = await self._redis_storage.xreadgroup(
+            self.group, consumer, {self.stream: ">"}, count=count, block=block
+        )
+        return self._parse(response[0][1]) if response else []
+
+    async def claim(self,
+                    consumer: str,
+                    count: int,
+                    min_idle_time: int) -> list[tuple[bytes, OutboxMessage | None]]:
+        """
+        Takes over the messages delivered to other senders, which
+        haven't been removed for 'min_idle_time' milliseconds.
+        """
+        pending = await self._redis_storage.xpending_range(
+            self.stream, self.group, "-", "+", count
+        )
+        entry_ids = [
+            entry["message_id"] for entry in pending
+            if entry["time_since_delivered"] >= min_idle_time
+        ]
+        if not entry_ids:
+            return []
+
+        entries = await self._redis_storage.xclaim(
+            self.stream, self.group, consumer, min_idle_time, entry_ids
+        )
+        return self._parse(entries)
+
+    async def remove(self, *entry_ids: bytes) -> None:
+        pipeline = self._redis_storage.pipeline(transaction=True)
+        pipeline.xack(self.stream, self.group, *entry_ids)
+        pipeline.xdel(self.stream, *entry_ids)
+        await pipeline.execute()
+
+    async def retry(self, entry_id: bytes, message: OutboxMessage, delay: float) -> None:
+        await self._retry(keys=[self.retries], args=[delay, message.dumps()])
+        await self.remove(entry_id)
+
+    async def reject(self, entry_id: bytes, message: OutboxMessage, reason: str) -> None:
+        await self._redis_storage.xadd(
+            self.dead_letters, {"message": message.dumps(), "reason": reason}
+        )
+        await self.remove(entry_id)
+
+
+outbox = EmailOutbox(redis, settings.EMAIL_OUTBOX_MAX_LENGTH)
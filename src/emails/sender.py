@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from email.message import EmailMessage
+from typing import Callable
+
+import aiosmtplib
+
+from src.emails.outbox import EmailOutbox, OutboxMessage, outbox
+from src.emails.templates import EmailTemplates, templates
+from src.metrics import timed
+from src.metrics.instruments import EMAIL_SEND_SECONDS, EMAILS
+from src.settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def create_smtp_connection() -> aiosmtplib.SMTP:
+    credentials = {}
+    if settings.MAIL_USE_CREDENTIALS:
+        credentials = {
+            "username": settings.MAIL_USERNAME,
+            "password": settings.MAIL_PASSWORD
+        }
+
+    return aiosmtplib.SMTP(
+        hostname=settings.MAIL_SERVER,
+        port=settings.MAIL_PORT,
+        use_tls=settings.MAIL_SSL,
+        start_tls=settings.MAIL_STARTTLS,
+        timeout=settings.MAIL_TIMEOUT,
+        **credentials
+    )
+
+
+class EmailSender:
+    """
+    Sends the messages of the outbox over a few SMTP connections, each
+    owned by a worker task, which are kept open between the messages,
+    so that the handshake isn't paid for each of them.
+
+    Each worker reads a batch of messages, sends them one after another
+    over its connection, reconnecting once if the server has dropped it,
+    and retries failed messages with an exponential backoff.
+
+    Notes:
+      A message rejected by the server with a permanent (5xx) error
+      isn't retried, it's moved to the dead letters straight away.
+    """
+
+    # The number of milliseconds a worker waits for new messages.
+    _READ_TIMEOUT = 1000
+
+    def __init__(self,
+                 outbox: EmailOutbox,
+                 templates: EmailTemplates,
+                 sender_address: str,
+                 connections: int,
+                 batch_size: int,
+                 max_attempts: int,
+                 retry_delay: float,
+                 claim_idle_time: float,
+                 connection_factory: Callable[[], aiosmtplib.SMTP] = create_smtp_connection):
+        """
+        Args:
+          connections:
+            The number of workers, each with its own SMTP connection.
+
+          retry_delay:
+            The number of seconds before the first retry,
+            doubled for each following one.
+
+          claim_idle_time:
+            The number of seconds after which the messages of an
+            unresponsive sender are taken over by another one.
+        """
+        self._outbox = outbox
+        self._templates = templates
+        self._sender_address = sender_address
+        self._connections = connections
+        self._batch_size = batch_size
+        self._max_attempts = max_attempts
+        self._retry_delay = retry_delay
+        self._claim_idle_time = claim_idle_time
+        self._connection_factory = connection_factory
+
+        self._workers: list[asyncio.Task] = []
+
+    def _render(self, message: OutboxMessage) -> EmailMessage:
+        email = EmailMessage()
+        email["From"] = self._sender_address
+        email["To"] = message.recipient
+        email["Subject"] = message.subject
+        email.set_content(self._templates.render(message.template_name, message.context))
+        return email
+
+    @staticmethod
+    @timed(EMAIL_SEND_SECONDS)
+    async def _send(connection: aiosmtplib.SMTP, email: EmailMessage) -> None:
+        if not connection.is_connected:
+            await connection.connect()
+        try:
+            await connection.send_message(email)
+        except (aiosmtplib.SMTPServerDisconnected, ConnectionError):
+            connection.close()
+            await connection.connect()
+            await connection.send_message(email)
+
+    async def _handle_failure(self,
+                              entry_id: bytes,
+                              message: OutboxMessage,
+                              exception: Exception) -> None:
+        is_permanent = (
+            isinstance(exception, aiosmtplib.SMTPResponseException)
+            and 500 <= exception.code < 600
+        )
+        if is_permanent or message.attempts + 1 >= self._max_attempts:
+            logger.error("The email %s can't be sent: %r.", message.id, exception)
+            await self._outbox.reject(entry_id, message, repr(exception))
+            EMAILS.labels("rejected").inc()
+            return
+
+        logger.warning("The email %s will be retried: %r.", message.id, exception)
+        delay = self._retry_delay * 2 ** message.attempts
+        await self._outbox.retry(entry_id, message.retried(), delay)
+        EMAILS.labels("retried").inc()
+
+    async def _send_batch(self,
+                          connection: aiosmtplib.SMTP,
+                          entries: list[tuple[bytes, OutboxMessage | None]]) -> None:
+        sent_entry_ids = []
+        for entry_id, message in entries:
+            if message is None:
+                sent_entry_ids.append(entry_id)
+                continue
+
+            try:
+                await self._send(connection, self._render(message))
+            except (aiosmtplib.SMTPException, OSError, KeyError) as exception:
+                await self._handle_failure(entry_id, message, exception)
+            else:
+                sent_entry_ids.append(entry_id)
+                EMAILS.labels("sent").inc()
+
+        if sent_entry_ids:
+            await self._outbox.remove(*sent_entry_ids)
+
+    async def _work(self, consumer: str) -> None:
+        connection = self._connection_factory()
+        claimed_at = time.monotonic()
+        try:
+            await self._outbox.create_group()
+            while True:
+                try:
+                    entries = []
+                    if time.monotonic() - claimed_at >= self._claim_idle_time:
+                        claimed_at = time.monotonic()
+                        entries = await self._outbox.claim(
+                            consumer,
+                            self._batch_size,
+                            int(self._claim_idle_time * 1000)
+                        )
+                    if not entries:
+                        entries = await self._outbox.read(
+                            consumer, self._batch_size, self._READ_TIMEOUT
+                        )
+                    await self._send_batch(connection, entries)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:  # noqa
+                    logger.warning("The email sender %s has failed.", consumer, exc_info=True)
+                    await asyncio.sleep(self._retry_delay)
+        finally:
+            if connection.is_connected:
+                connection.close()
+
+    def start(self) -> None:
+        prefix = f"{socket.gethostname()}-{os.getpid()}"
+        for index in range(self._connections):
+            self._workers.append(asyncio.create_task(self._work(f"{prefix}-{index}")))
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+
+sender = EmailSender(
+    outbox,
+    templates,
+    settings.MAIL_FROM,
+    settings.EMAIL_SENDER_CONNECTIONS,
+    settings.EMAIL_SENDER_BATCH_SIZE,
+    settings.EMAIL_SENDER_MAX_ATTEMPTS,
+    settings.EMAIL_SENDER_RETRY_DELAY,
+    settings.EMAIL_SENDER_CLAIM_IDLE_TIME
+)
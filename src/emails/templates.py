@@ -0,0 +1,32 @@
+from pathlib import Path
+from typing import Any
+
+import jinja2
+
+
+class EmailTemplates:
+    """
+    Compiles every template of the directory once, up front,
+    so that rendering an email doesn't touch the file system.
+    """
+
+    def __init__(self, directory: Path):
+        environment = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(directory),
+            undefined=jinja2.StrictUndefined,
+            keep_trailing_newline=True
+        )
+        self._templates = {
+            name: environment.get_template(name)
+            for name in environment.list_templates()
+        }
+
+    def render(self, template_name: str, context: dict[str, Any]) -> str:
+        """
+        Raises:
+          KeyError: If there's no such template.
+        """
+        return self._templates[template_name].render(context)
+
+
+templates = EmailTemplates(Path(__file__).parents[1] / "email_templates")
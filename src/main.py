@@ -1,21 +1,155 @@
-from fastapi import FastAPI
+import logging
+
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 from fastapi_utils.tasks import repeat_every
 
 from src.api.api_v1 import api_router
+from src.api.dependencies import blacklist, blacklist_backend
+from src.database.engine import check_liveness, engine
+from src.database.replicas import replicas
 from src.database.session import AsyncSession
+from src.emails import EmailOutboxFull, sender
+from src.metrics import MetricsMiddleware, metrics_endpoint
+from src.scheduler import scheduler
+from src.security.jwt import PostgresBlacklistBackend, SharedMemoryBlacklistFull
+from src.security.jwt.generations import generations
+from src.security.jwt.keys import keyring
+from src.security.password import hasher, PasswordHashingOverloaded
+from src.services.user_cache import user_cache
 from src.services.users import delete_unconfirmed_users
 from src.settings import settings
 
 
+logger = logging.getLogger(__name__)
+
 application = FastAPI(
     title=settings.APPLICATION_NAME,
     openapi_url=f"{settings.API_V1}/openapi.json"
 )
+application.add_middleware(MetricsMiddleware)
 application.include_router(api_router)
+application.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+
+
+@application.exception_handler(PasswordHashingOverloaded)
+async def password_hashing_overloaded_handler(
+    request: Request,
+    exception: PasswordHashingOverloaded
+) -> JSONResponse:
+    return JSONResponse(
+        {"detail": "The server is busy, try again later."},
+        status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "1"}
+    )
+
+
+@application.exception_handler(EmailOutboxFull)
+async def email_outbox_full_handler(
+    request: Request,
+    exception: EmailOutboxFull
+) -> JSONResponse:
+    logger.warning("An email has been rejected: %s", exception)
+    return JSONResponse(
+        {"detail": "The server is busy, try again later."},
+        status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "60"}
+    )
+
+
+@application.exception_handler(SharedMemoryBlacklistFull)
+async def shared_memory_blacklist_full_handler(
+    request: Request,
+    exception: SharedMemoryBlacklistFull
+) -> JSONResponse:
+    logger.error(
+        "A JSON Web Token couldn't be blacklisted, "
+        "JWT_BLACKLIST_SHARED_MEMORY_CAPACITY must be raised: %s",
+        exception
+    )
+    return JSONResponse(
+        {"detail": "The server can't revoke tokens at the moment, try again later."},
+        status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "60"}
+    )
 
 
 @application.on_event("startup")
-@repeat_every(seconds=settings.USERS_CLEANUP_DELAY)
+async def start_subscriptions() -> None:
+    blacklist.start()
+    user_cache.start()
+    generations.start()
+
+
+@application.on_event("shutdown")
+async def stop_subscriptions() -> None:
+    await blacklist.stop()
+    await user_cache.stop()
+    await generations.stop()
+
+
+@scheduler.job("cleanup-unconfirmed-users", interval=settings.USERS_CLEANUP_DELAY)
 async def cleanup_unconfirmed_users() -> None:
     async with AsyncSession() as session:
-        await delete_unconfirmed_users(session)
+        report = await delete_unconfirmed_users(session)
+    logger.info(
+        "%d unconfirmed users have been deleted in %d batches, in %.1f s.",
+        report.deleted_users,
+        report.batches,
+        report.duration
+    )
+
+
+if isinstance(blacklist_backend, PostgresBlacklistBackend):
+    @scheduler.job("sweep-jwt-blacklist", interval=settings.JWT_BLACKLIST_SWEEP_INTERVAL)
+    async def sweep_jwt_blacklist() -> None:
+        deleted = await blacklist_backend.sweep()
+        logger.info("%d expired JSON Web Tokens have been swept from the blacklist.", deleted)
+
+
+@application.on_event("startup")
+async def start_email_sender() -> None:
+    sender.start()
+
+
+@application.on_event("shutdown")
+async def stop_email_sender() -> None:
+    await sender.stop()
+
+
+@application.on_event("startup")
+async def start_scheduler() -> None:
+    scheduler.start()
+
+
+@application.on_event("shutdown")
+async def stop_scheduler() -> None:
+    await scheduler.stop()
+
+
+if settings.POSTGRES_LIVENESS_CHECK == "periodic":
+    @application.on_event("startup")
+    @repeat_every(seconds=settings.POSTGRES_LIVENESS_CHECK_INTERVAL)
+    async def check_database_liveness() -> None:
+        await check_liveness(engine)
+
+
+# Every process keeps track of the replicas' health itself.
+if settings.POSTGRES_REPLICA_URIS:
+    @application.on_event("startup")
+    @repeat_every(seconds=settings.POSTGRES_REPLICA_CHECK_INTERVAL)
+    async def check_replicas_health() -> None:
+        await replicas.check_health()
+
+
+# Every process reloads the keys itself, so it's not a scheduler job.
+if keyring is not None:
+    @application.on_event("startup")
+    @repeat_every(seconds=settings.JWT_KEYS_REFRESH_INTERVAL)
+    def refresh_jwt_keys() -> None:
+        keyring.refresh()
+
+
+@application.on_event("shutdown")
+def shutdown_password_hasher() -> None:
+    hasher.shutdown()
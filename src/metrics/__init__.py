@@ -0,0 +1,4 @@
+from src.metrics.database import InstrumentedPool, pool_collector
+from src.metrics.exposition import metrics_endpoint
+from src.metrics.http import MetricsMiddleware
+from src.metrics.timing import timed
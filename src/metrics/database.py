@@ -0,0 +1,89 @@
+import time
+from typing import TYPE_CHECKING, Iterator
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "The time taken to check a connection out of the pool, "
+    "including waiting for a free one and the liveness check.",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+POOL_CHECKOUT_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts",
+    "The number of checkouts given up after the pool timeout.",
+    ["pool"]
+)
+
+REPLICA_HEALTHY = Gauge(
+    "db_replica_healthy",
+    "Whether the replica passed its last health check (1) or not (0).",
+    ["pool"]
+)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Observes how long each checkout takes, which exposes pool starvation.
+    The pool is labelled by its logging name ('pool_logging_name').
+    """
+
+    def connect(self):
+        pool_name = self.logging_name or "default"
+        started_at = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            POOL_CHECKOUT_TIMEOUTS.labels(pool_name).inc()
+            raise
+        finally:
+            POOL_CHECKOUT_SECONDS.labels(pool_name).observe(time.perf_counter() - started_at)
+
+
+class PoolCollector:
+    """
+    Reports the state of the pools of the registered engines when scraped.
+
+    Notes:
+      The engine, rather than its pool, is kept, as
+      disposing of an engine replaces its pool.
+    """
+
+    def __init__(self):
+        self._engines: dict[str, "AsyncEngine"] = {}
+
+    def register(self, name: str, engine: "AsyncEngine") -> None:
+        self._engines[name] = engine
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        size = GaugeMetricFamily(
+            "db_pool_size",
+            "The number of connections the pool keeps open.",
+            labels=["pool"]
+        )
+        connections = GaugeMetricFamily(
+            "db_pool_connections",
+            "The number of connections by state: checked out, idle in the "
+            "pool, or overflow (opened beyond the pool size).",
+            labels=["pool", "state"]
+        )
+        for name, engine in self._engines.items():
+            pool = engine.sync_engine.pool
+            size.add_metric([name], pool.size())
+            connections.add_metric([name, "checked_out"], pool.checkedout())
+            connections.add_metric([name, "idle"], pool.checkedin())
+            connections.add_metric([name, "overflow"], max(pool.overflow(), 0))
+        yield size
+        yield connections
+
+
+pool_collector = PoolCollector()
+REGISTRY.register(pool_collector)
@@ -0,0 +1,11 @@
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """
+    Exposes the metrics of this process in the Prometheus text format.
+    """
+    # The media type is passed as a header, or Starlette appends another charset.
+    return Response(generate_latest(REGISTRY), headers={"Content-Type": CONTENT_TYPE_LATEST})
@@ -0,0 +1,72 @@
+from prometheus_client import Counter, Histogram
+
+
+# For operations taking from microseconds to a few milliseconds.
+FAST_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25
+)
+# For password hashing, which is slow on purpose.
+HASHING_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+JWT_DECODE_SECONDS = Histogram(
+    "jwt_decode_seconds",
+    "The time taken to decode and verify a JSON Web Token.",
+    buckets=FAST_BUCKETS
+)
+JWT_ISSUED = Counter(
+    "jwt_issued",
+    "The number of JSON Web Tokens created, by mission.",
+    ["mission"]
+)
+
+JWT_BLACKLIST_SECONDS = Histogram(
+    "jwt_blacklist_seconds",
+    "The time taken by a blacklist operation.",
+    ["operation"],
+    buckets=FAST_BUCKETS
+)
+JWT_BLACKLIST_HITS = Counter(
+    "jwt_blacklist_hits",
+    "The number of JSON Web Tokens found in the blacklist, by operation.",
+    ["operation"]
+)
+
+USERS_QUERY_SECONDS = Histogram(
+    "users_query_seconds",
+    "The time taken by a function of the users service.",
+    ["query"],
+    buckets=FAST_BUCKETS
+)
+
+PASSWORD_HASHING_SECONDS = Histogram(
+    "password_hashing_seconds",
+    "The time taken to hash or verify a password, including the queueing.",
+    ["operation"],
+    buckets=HASHING_BUCKETS
+)
+
+EMAIL_SEND_SECONDS = Histogram(
+    "email_send_seconds",
+    "The time taken to send an email over SMTP."
+)
+EMAILS = Counter(
+    "emails",
+    "The number of emails handled by the senders, by outcome.",
+    ["outcome"]
+)
+
+MFA_TOKENS_SUPPRESSED = Counter(
+    "mfa_tokens_suppressed",
+    "The number of multi-factor authentication token requests "
+    "answered without sending a token, by mission and reason.",
+    ["mission", "reason"]
+)
+
+RATE_LIMITED = Counter(
+    "rate_limited_requests",
+    "The number of requests rejected by a rate limit, by operation "
+    "and by where the rejection was decided (local or redis).",
+    ["operation", "checked"]
+)
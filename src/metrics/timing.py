@@ -0,0 +1,37 @@
+import functools
+import inspect
+from time import perf_counter
+from typing import Callable
+
+from prometheus_client import Histogram
+
+
+def timed(histogram: Histogram, *label_values: str) -> Callable:
+    """
+    Observes the duration of every call of the decorated function,
+    or coroutine function, in the histogram.
+
+    The labelled child of the histogram is looked up once, here, so
+    each call only costs two clock reads and an observation.
+    """
+    metric = histogram.labels(*label_values) if label_values else histogram
+
+    def decorate(function: Callable) -> Callable:
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                started_at = perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    metric.observe(perf_counter() - started_at)
+        else:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                started_at = perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    metric.observe(perf_counter() - started_at)
+        return wrapper
+    return decorate
@@ -1,2 +1,3 @@
 from src.models.base import BaseModel
 from src.models.user import User
+from src.models.jwt_blacklist_record import JWTBlacklistRecord
@@ -0,0 +1,27 @@
+import sqlalchemy
+
+from src.models import BaseModel
+
+
+class JWTBlacklistRecord(BaseModel):
+    """
+    A JSON Web Token blacklisted by the Postgres backend.
+
+    The table is unlogged: its writes skip the write-ahead log, which
+    makes them several times cheaper, but it's emptied by a crash of
+    the server, and isn't replicated. A crash can thus revive the
+    JSON Web Tokens blacklisted before it, until they expire.
+    """
+
+    __tablename__ = "jwt_blacklist"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key = sqlalchemy.Column(
+        sqlalchemy.LargeBinary,
+        primary_key=True
+    )
+    expires_at = sqlalchemy.Column(
+        sqlalchemy.DateTime(timezone=True),
+        index=True,
+        nullable=False
+    )
@@ -45,3 +45,11 @@ class User(BaseModel):
     def full_name(self) -> str:
         return "{} {}".format(self.first_name, self.last_name)
 
+
+# Serves the periodic deletion of unconfirmed users,
+# without indexing the bulk of the confirmed ones.
+sqlalchemy.Index(
+    "ix_user_created_at_unconfirmed",
+    User.created_at,
+    postgresql_where=User.is_confirmed == sqlalchemy.false()
+)
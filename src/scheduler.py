@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import random
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Awaitable, Callable
+
+from src.database.redis import redis
+from src.settings import settings
+
+if TYPE_CHECKING:
+    from aioredis import Redis
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PeriodicJob:
+    name: str
+    function: Callable[[], Awaitable[None]]
+    interval: float
+
+
+class PeriodicJobScheduler:
+    """
+    Every application process registers the same maintenance jobs,
+    but each job must run only once per interval across all of them.
+
+    So a process runs a job only while it holds a lease on it in Redis.
+    The lease is taken only if the job hasn't run for the interval, which
+    is checked against the persisted time of the last run, so restarts
+    don't re-run jobs either. The lease is renewed while the job runs,
+    and each lease carries a fencing token, so that a process whose lease
+    has expired can't release, or record a run over, a newer lease.
+
+    Notes:
+      All the times are taken from the Redis server clock.
+    """
+
+    # KEYS: lease, fencing counter, last run.
+    # ARGV: lease time-to-live and job interval, in milliseconds.
+    _ACQUIRE_SCRIPT = """
+    if redis.call('EXISTS', KEYS[1]) == 1 then
+        return nil
+    end
+    local time = redis.call('TIME')
+    local now = time[1] * 1000 + math.floor(time[2] / 1000)
+    local last_run = tonumber(redis.call('GET', KEYS[3]))
+    if last_run and now - last_run < tonumber(ARGV[2]) then
+        return nil
+    end
+    local token = redis.call('INCR', KEYS[2])
+    redis.call('SET', KEYS[1], token, 'PX', ARGV[1])
+    return token
+    """
+    # KEYS: last run. ARGV: job interval, in milliseconds.
+    _GET_DELAY_SCRIPT = """
+    local time = redis.call('TIME')
+    local now = time[1] * 1000 + math.floor(time[2] / 1000)
+    local last_run = tonumber(redis.call('GET', KEYS[1]))
+    if not last_run then
+        return 0
+    end
+    return math.max(last_run + tonumber(ARGV[1]) - now, 0)
+    """
+    # KEYS: lease. ARGV: fencing token, lease time-to-live in milliseconds.
+    _RENEW_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+    # KEYS: lease, last run. ARGV: fencing token, '1' to record the run.
+    _RELEASE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+        return 0
+    end
+    if ARGV[2] == '1' then
+        local time = redis.call('TIME')
+        redis.call('SET', KEYS[2], time[1] * 1000 + math.floor(time[2] / 1000))
+    end
+    return redis.call('DEL', KEYS[1])
+    """
+
+    def __init__(self,
+                 redis_storage: "Redis",
+                 lease_ttl: float,
+                 jitter: float,
+                 namespace: str = "scheduler"):
+        """
+        Args:
+          lease_ttl:
+            The number of seconds a lease lasts unless renewed.
+            It's renewed three times per this period.
+
+          jitter:
+            The maximum number of seconds randomly added to each
+            wait, so that processes don't compete in lockstep.
+        """
+        self._redis_storage = redis_storage
+        self._lease_ttl = lease_ttl
+        self._jitter = jitter
+        self._namespace = namespace
+
+        self._acquire = redis_storage.register_script(self._ACQUIRE_SCRIPT)
+        self._get_delay = redis_storage.register_script(self._GET_DELAY_SCRIPT)
+        self._renew = redis_storage.register_script(self._RENEW_SCRIPT)
+        self._release = redis_storage.register_script(self._RELEASE_SCRIPT)
+
+        self._jobs: list[PeriodicJob] = []
+        self._tasks: list[asyncio.Task] = []
+
+    def job(self, name: str, interval: float) -> Callable:
+        """
+        Registers the decorated coroutine function
+        as a job run every 'interval' seconds.
+        """
+        def register(function: Callable[[], Awaitable[None]]) -> Callable:
+            self._jobs.append(PeriodicJob(name, function, interval))
+            return function
+        return register
+
+    def _get_keys(self, job: PeriodicJob) -> tuple[str, str, str]:
+        prefix = f"{self._namespace}:{job.name}"
+        return f"{prefix}:lease", f"{prefix}:fence", f"{prefix}:last-run"
+
+    async def _keep_lease(self, lease_key: str, token: int, job_task: asyncio.Task) -> None:
+        lease_ttl_ms = int(self._lease_ttl * 1000)
+        while True:
+            await asyncio.sleep(self._lease_ttl / 3)
+            try:
+                is_renewed = await self._renew(keys=[lease_key], args=[token, lease_ttl_ms])
+            except Exception:  # noqa
+                logger.warning("The lease %s can't be renewed.", lease_key, exc_info=True)
+                continue
+            if not is_renewed:
+                logger.warning("The lease %s has been lost, the job is cancelled.", lease_key)
+                job_task.cancel()
+                return
+
+    async def _run_once(self, job: PeriodicJob) -> None:
+        lease_key, fence_key, last_run_key = self._get_keys(job)
+        token = await self._acquire(
+            keys=[lease_key, fence_key, last_run_key],
+            args=[int(self._lease_ttl * 1000), int(job.interval * 1000)]
+        )
+        if token is None:
+            return
+
+        job_task = asyncio.create_task(job.function())
+        lease_task = asyncio.create_task(self._keep_lease(lease_key, token, job_task))
+        is_succeeded = False
+        try:
+            await job_task
+            is_succeeded = True
+        except asyncio.CancelledError:
+            # Unless it's been cancelled because the lease has been lost.
+            if not lease_task.done():
+                raise
+        except Exception:  # noqa
+            logger.exception("The job %s has failed.", job.name)
+        finally:
+            lease_task.cancel()
+            await self._release(
+                keys=[lease_key, last_run_key],
+                args=[token, "1" if is_succeeded else "0"]
+            )
+
+    async def _run_forever(self, job: PeriodicJob) -> None:
+        _, _, last_run_key = self._get_keys(job)
+        while True:
+            try:
+                delay_ms = await self._get_delay(
+                    keys=[last_run_key], args=[int(job.interval * 1000)]
+                )
+                # Whether the job is due now or another process
+                # holds the lease, it's checked again after a while.
+                delay = max(delay_ms / 1000, self._lease_ttl / 3)
+                await asyncio.sleep(delay + random.uniform(0, self._jitter))
+                await self._run_once(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa
+                logger.warning("The job %s can't be scheduled.", job.name, exc_info=True)
+                await asyncio.sleep(self._lease_ttl)
+
+    def start(self) -> None:
+        for job in self._jobs:
+            self._tasks.append(asyncio.create_task(self._run_forever(job)))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+
+scheduler = PeriodicJobScheduler(
+    redis,
+    settings.SCHEDULER_LEASE_TTL,
+    settings.SCHEDULER_JITTER
+)
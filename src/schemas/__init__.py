@@ -1,6 +1,13 @@
-from src.schemas.jwt_claims import JWTClaims
+from src.schemas.jwt_claims import JWTClaims, InvalidJWTClaims
+from src.schemas.introspection import (
+    IntrospectionRequest,
+    IntrospectionResult,
+    IntrospectionResponse
+)
 from src.schemas.response_acess_token import ResponseAccessToken
 from src.schemas.response_message import ResponseMessage
+from src.schemas.user_credentials import UserCredentials
+from src.schemas.user_snapshot import UserSnapshot
 from src.schemas.user import (
     UserCreationSchema,
     Credentials,
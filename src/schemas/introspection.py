@@ -0,0 +1,32 @@
+import pydantic
+
+from src.schemas.user import UserDisplaySchema
+from src.settings import settings
+
+
+class IntrospectionRequest(pydantic.BaseModel):
+    tokens: list[str] = pydantic.Field(
+        min_items=1,
+        max_items=settings.INTROSPECTION_MAX_TOKENS
+    )
+    include_users: bool = False
+
+
+class IntrospectionResult(pydantic.BaseModel):
+    """
+    The state of a token, as in RFC 7662: an inactive
+    token is described by 'active' alone.
+    """
+
+    active: bool
+    sub: str | None = None
+    exp: int | None = None
+    mission: str | None = None
+    jti: str | None = None
+    gen: int | None = None
+    user: UserDisplaySchema | None = None
+
+
+class IntrospectionResponse(pydantic.BaseModel):
+    # In the order of the requested tokens.
+    results: list[IntrospectionResult]
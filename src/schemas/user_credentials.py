@@ -0,0 +1,14 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class UserCredentials:
+    """
+    The columns of a user that authentication reads, loaded straight
+    from a row without the ORM, as login is on the hot path and never
+    needs the rest of the user.
+    """
+
+    id: int
+    password: str
+    is_confirmed: bool
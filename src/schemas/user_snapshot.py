@@ -0,0 +1,50 @@
+import json
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from src.models import User
+
+
+@dataclass(frozen=True, slots=True)
+class UserSnapshot:
+    """
+    A read-only copy of a user row, detached from any database
+    session, so that it can be cached and shared between requests.
+
+    It deliberately omits the password hash.
+    """
+
+    id: int
+    first_name: str
+    last_name: str
+    email_address: str
+    is_confirmed: bool
+    created_at: datetime
+
+    @property
+    def full_name(self) -> str:
+        return "{} {}".format(self.first_name, self.last_name)
+
+    @classmethod
+    def from_user(cls, user: "User") -> "UserSnapshot":
+        return cls(
+            user.id,
+            user.first_name,
+            user.last_name,
+            user.email_address,
+            user.is_confirmed,
+            user.created_at
+        )
+
+    def dumps(self) -> str:
+        fields = asdict(self)
+        fields["created_at"] = self.created_at.isoformat()
+        return json.dumps(fields)
+
+    @classmethod
+    def loads(cls, document: str | bytes) -> "UserSnapshot":
+        fields = json.loads(document)
+        fields["created_at"] = datetime.fromisoformat(fields["created_at"])
+        return cls(**fields)
@@ -0,0 +1,97 @@
+"""
+Picks password hashing costs for a target verification time
+on the current hardware, and prints them as settings.
+
+Usage:
+  python -m src.security.calibration [--target-time 0.25]
+"""
+import argparse
+import time
+
+from src.security.password import create_crypt_context
+from src.settings import settings
+
+
+MIN_BCRYPT_ROUNDS = 10
+MAX_BCRYPT_ROUNDS = 20
+MAX_ARGON2_TIME_COST = 50
+
+
+def measure_verification_time(scheme: str,
+                              bcrypt_rounds: int = settings.BCRYPT_ROUNDS,
+                              argon2_time_cost: int = settings.ARGON2_TIME_COST,
+                              samples: int = 3) -> float:
+    """
+    Returns: The best of several verification times, in seconds.
+    """
+    ctx = create_crypt_context(bcrypt_rounds, argon2_time_cost)
+    hashed_password = ctx.handler(scheme).hash("Calibration123")
+
+    timings = []
+    for _ in range(samples):
+        started_at = time.perf_counter()
+        ctx.verify("Calibration123", hashed_password)
+        timings.append(time.perf_counter() - started_at)
+    return min(timings)
+
+
+def calibrate_bcrypt(target_time: float) -> tuple[int, float]:
+    """
+    Returns: The largest number of rounds whose verification
+             doesn't exceed the target time, and that time.
+
+    Notes:
+      Each round doubles the work, so it's never worth measuring
+      more than one round past the target.
+    """
+    rounds = MIN_BCRYPT_ROUNDS
+    timing = measure_verification_time("bcrypt", bcrypt_rounds=rounds)
+
+    while rounds < MAX_BCRYPT_ROUNDS:
+        next_timing = measure_verification_time("bcrypt", bcrypt_rounds=rounds + 1)
+        if next_timing > target_time:
+            break
+        rounds, timing = rounds + 1, next_timing
+    return rounds, timing
+
+
+def calibrate_argon2(target_time: float) -> tuple[int, float]:
+    """
+    Returns: The largest time cost whose verification, with the
+             configured memory cost and parallelism, doesn't exceed
+             the target time, and that time.
+    """
+    time_cost = 1
+    timing = measure_verification_time("argon2", argon2_time_cost=time_cost)
+
+    while time_cost < MAX_ARGON2_TIME_COST:
+        next_timing = measure_verification_time(
+            "argon2", argon2_time_cost=time_cost + 1
+        )
+        if next_timing > target_time:
+            break
+        time_cost, timing = time_cost + 1, next_timing
+    return time_cost, timing
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--target-time",
+        type=float,
+        default=0.25,
+        help="The desired verification time of a single password, in seconds."
+    )
+    arguments = parser.parse_args()
+
+    for scheme in settings.PASSWORD_HASHING_SCHEMES:
+        if scheme == "bcrypt":
+            rounds, timing = calibrate_bcrypt(arguments.target_time)
+            print(f"BCRYPT_ROUNDS={rounds}  # {timing * 1000:.0f} ms")
+        elif scheme == "argon2":
+            time_cost, timing = calibrate_argon2(arguments.target_time)
+            print(f"ARGON2_TIME_COST={time_cost}  # {timing * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,12 @@
 from src.security.jwt.blacklist import JWTBlacklist
+from src.security.jwt.blacklist_backends import (
+    JWTBlacklistBackend,
+    PostgresBlacklistBackend,
+    RedisBlacklistBackend,
+    SharedMemoryBlacklistBackend,
+    SharedMemoryBlacklistFull
+)
+from src.security.jwt.blacklist_filter import JWTBlacklistFilter
+from src.security.jwt.generations import JWTGenerations
 from src.security.jwt.mission import JWTMission
 from src.security.jwt.serialization import create_jwt, decode_jwt
\ No newline at end of file
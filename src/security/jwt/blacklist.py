@@ -1,9 +1,15 @@
+import asyncio
 from calendar import timegm
 from datetime import datetime
+from hashlib import blake2b
 from typing import TYPE_CHECKING
 
+from src.metrics import timed
+from src.metrics.instruments import JWT_BLACKLIST_HITS, JWT_BLACKLIST_SECONDS
+from src.security.jwt.blacklist_backends.base import Lookup
+
 if TYPE_CHECKING:
-    from aioredis import Redis
+    from src.security.jwt.blacklist_backends import JWTBlacklistBackend
 
 
 class JWTBlacklist:
@@ -12,30 +18,218 @@ class JWTBlacklist:
     JSON Web Token before it expires, but it's impossible
     because this mechanism works independently of the server.
 
-    So this class stores wasted JWTs in Redis, which allows
-    the application to invalidate a JSON Web Token prematurely.
+    So this class stores wasted JWTs in a JWTBlacklistBackend (Redis,
+    Postgres or shared memory), which allows the application to
+    invalidate a JSON Web Token prematurely.
+
+    A JSON Web Token is stored as a short digest of its 'jti' claim
+    rather than the whole encoded token. JSON Web Tokens issued before
+    'jti' was introduced are stored as a digest of the encoded token,
+    and the records created for them by the previous versions, which
+    are the encoded tokens themselves, are still honoured.
+
+    Lookups issued at about the same time are coalesced, so that
+    a single request to the backend answers all of them. Lookups of
+    JSON Web Tokens that the backend knows for certain not to be
+    blacklisted aren't sent at all.
     """
 
-    def __init__(self, redis_storage: "Redis"):
-        self._redis_storage = redis_storage
-        # Zero is used as the value for each
-        # record because we only work with keys.
-        self._default_value = 0
+    namespace = b"jwt:bl:"
+    digest_size = 16
+
+    def __init__(self,
+                 backend: "JWTBlacklistBackend",
+                 batch_max_size: int = 1,
+                 batch_max_wait: float = 0):
+        """
+        Args:
+          backend:
+            The storage of the blacklist.
+
+          batch_max_size:
+            The maximum number of lookups sent to the backend at once.
+            If it's 1, each lookup is sent on its own.
+
+          batch_max_wait:
+            The number of seconds a lookup may wait for others
+            to join its batch. If it's 0, only lookups issued in
+            the same event loop iteration are batched together.
+        """
+        self._backend = backend
+
+        self._batch_max_size = batch_max_size
+        self._batch_max_wait = batch_max_wait
+        self._pending_lookups: list[tuple[Lookup, asyncio.Future]] = []
+        self._flush_handle: asyncio.Handle | None = None
+        # Strong references to the running batches,
+        # otherwise their tasks could be garbage-collected.
+        self._running_batches: set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        self._backend.start()
+
+    async def stop(self) -> None:
+        await self._backend.stop()
+
+    @classmethod
+    def get_key(cls, jwt: str, jti: str | None = None) -> bytes:
+        """
+        Returns: The blacklist record key of the JSON Web Token.
+        """
+        token_id = jwt if jti is None else jti
+        digest = blake2b(token_id.encode(), digest_size=cls.digest_size)
+        return cls.namespace + digest.digest()
+
+    @staticmethod
+    def _get_lifetime(exp: int) -> int | None:
+        """
+        Returns: The number of seconds the JSON Web Token must be kept
+                 in the blacklist, or None if it has already expired.
+
+        Notes:
+          A JSON Web Token is still accepted during the second of
+          its 'exp', so such a token is kept for one more second.
+        """
+        current_timetuple = datetime.utcnow().utctimetuple()
+        lifetime = exp - timegm(current_timetuple)
+        if lifetime < 0:
+            return None
+        return max(lifetime, 1)
 
-    async def is_blocked(self, jwt: str) -> bool:
+    @timed(JWT_BLACKLIST_SECONDS, "is_blocked")
+    async def is_blocked(self, jwt: str, jti: str | None = None) -> bool:
         """
         Returns: A Boolean value designating whether
                  the JSON Web Token is in the blacklist.
         """
-        record = await self._redis_storage.exists(jwt)
-        return bool(record)
+        lookup = self._get_lookup(jwt, jti)
+        if lookup is None:
+            return False
+
+        if self._batch_max_size <= 1:
+            is_blocked, = await self._backend.contains([lookup])
+            return self._count_hit(is_blocked)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending_lookups.append((lookup, future))
+
+        if len(self._pending_lookups) >= self._batch_max_size:
+            self._flush_lookups()
+        elif self._flush_handle is None:
+            if self._batch_max_wait > 0:
+                self._flush_handle = loop.call_later(
+                    self._batch_max_wait, self._flush_lookups
+                )
+            else:
+                self._flush_handle = loop.call_soon(self._flush_lookups)
+
+        return self._count_hit(await future)
+
+    @timed(JWT_BLACKLIST_SECONDS, "are_blocked")
+    async def are_blocked(self, tokens: list[tuple[str, str | None]]) -> list[bool]:
+        """
+        Args:
+          tokens: The JSON Web Tokens, each with its 'jti', if any.
+
+        Returns: A Boolean value for each JSON Web Token designating
+                 whether it's in the blacklist, all of them having been
+                 looked up in a single request to the backend.
+        """
+        results = [False] * len(tokens)
+        lookups = []
+        looked_up = []
+        for index, (jwt, jti) in enumerate(tokens):
+            lookup = self._get_lookup(jwt, jti)
+            if lookup is not None:
+                lookups.append(lookup)
+                looked_up.append(index)
+
+        if lookups:
+            for index, is_blocked in zip(looked_up, await self._backend.contains(lookups)):
+                results[index] = self._count_hit(is_blocked)
+        return results
+
+    def _get_lookup(self, jwt: str, jti: str | None) -> Lookup | None:
+        """
+        Returns: The key of the JSON Web Token and, if it has no 'jti',
+                 its legacy key, or None if the backend certainly
+                 doesn't store it.
+        """
+        key = self.get_key(jwt, jti)
+        if jti is None:
+            return key, jwt
+        if not self._backend.might_contain(key):
+            return None
+        return key, None
+
+    @staticmethod
+    def _count_hit(is_blocked: bool) -> bool:
+        if is_blocked:
+            JWT_BLACKLIST_HITS.labels("is_blocked").inc()
+        return is_blocked
+
+    def _flush_lookups(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending_lookups = self._pending_lookups, []
+        task = asyncio.create_task(self._execute_lookups(batch))
+        self._running_batches.add(task)
+        task.add_done_callback(self._running_batches.discard)
+
+    async def _execute_lookups(self, batch: list[tuple[Lookup, asyncio.Future]]) -> None:
+        """
+        Sends the batch of lookups to the backend at once and
+        hands each result over to the waiting coroutine.
+        """
+        try:
+            results = await self._backend.contains([lookup for lookup, _ in batch])
+        except Exception as exception:
+            results = [exception] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            # The waiting coroutine may have been cancelled.
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
 
-    async def block(self, jwt: str, exp: int) -> None:
+    @timed(JWT_BLACKLIST_SECONDS, "block")
+    async def block(self, jwt: str, exp: int, jti: str | None = None) -> None:
         """
         Adds the JSON Web Token to the blacklist until its
         signatures expires.
+
+        An expired JSON Web Token is rejected anyway,
+        so there is no need to store it.
         """
-        current_timetuple = datetime.utcnow().utctimetuple()
-        lifetime = exp - timegm(current_timetuple)
+        lifetime = self._get_lifetime(exp)
+        if lifetime is None:
+            return
+
+        await self._backend.add(self.get_key(jwt, jti), lifetime)
+
+    @timed(JWT_BLACKLIST_SECONDS, "consume")
+    async def consume(self, jwt: str, exp: int, jti: str | None = None) -> bool:
+        """
+        Atomically checks that the JSON Web Token isn't in the
+        blacklist and adds it there, in a single backend operation.
+
+        Returns: A Boolean value designating whether this caller
+                 is the one that has blacklisted the JSON Web Token.
+                 False if it had already been blacklisted, or expired.
+        """
+        lifetime = self._get_lifetime(exp)
+        if lifetime is None:
+            return False
+
+        key = self.get_key(jwt, jti)
+        is_set = await self._backend.add_if_absent(key, lifetime, jwt if jti is None else None)
 
-        await self._redis_storage.set(jwt, self._default_value, lifetime)
+        if not is_set:
+            JWT_BLACKLIST_HITS.labels("consume").inc()
+        return is_set
@@ -0,0 +1,7 @@
+from src.security.jwt.blacklist_backends.base import JWTBlacklistBackend
+from src.security.jwt.blacklist_backends.postgres import PostgresBlacklistBackend
+from src.security.jwt.blacklist_backends.redis import RedisBlacklistBackend
+from src.security.jwt.blacklist_backends.shared_memory import (
+    SharedMemoryBlacklistBackend,
+    SharedMemoryBlacklistFull
+)
@@ -0,0 +1,57 @@
+from abc import ABC, abstractmethod
+
+# The key of a JSON Web Token, and its legacy key if it has no 'jti'.
+Lookup = tuple[bytes, str | None]
+
+
+class JWTBlacklistBackend(ABC):
+    """
+    Stores the records of a JWTBlacklist: keys, each of which
+    expires after its lifetime.
+
+    Besides its key, a JSON Web Token issued before 'jti' was introduced
+    may have a legacy record, whose key is the encoded token itself.
+    Only the Redis backend may have such records, the others merely
+    look them up in vain.
+    """
+
+    def might_contain(self, key: bytes) -> bool:
+        """
+        Returns: False if the key is certainly not stored, without
+                 querying the storage. True if it may be.
+        """
+        return True
+
+    @abstractmethod
+    async def contains(self, lookups: list[Lookup]) -> list[bool]:
+        """
+        Args:
+          lookups: The keys, each with its legacy key, if any.
+
+        Returns: A Boolean value for each lookup designating whether the
+                 key or the legacy key is stored, and hasn't expired.
+        """
+
+    @abstractmethod
+    async def add(self, key: bytes, lifetime: int) -> None:
+        """
+        Stores the key for 'lifetime' seconds.
+        """
+
+    @abstractmethod
+    async def add_if_absent(self,
+                            key: bytes,
+                            lifetime: int,
+                            legacy_key: str | None = None) -> bool:
+        """
+        Atomically stores the key for 'lifetime' seconds,
+        unless it, or the legacy key, is already stored.
+
+        Returns: A Boolean value designating whether the key has been stored.
+        """
+
+    def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
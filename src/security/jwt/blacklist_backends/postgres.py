@@ -0,0 +1,85 @@
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+from sqlalchemy import Interval, LargeBinary, any_, bindparam, delete, func, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+
+from src.models import JWTBlacklistRecord
+from src.security.jwt.blacklist_backends.base import JWTBlacklistBackend, Lookup
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+EXPIRES_AT = func.now() + bindparam("lifetime", type_=Interval)
+
+SELECT_LIVE_KEYS = select(JWTBlacklistRecord.key).where(
+    JWTBlacklistRecord.key == any_(bindparam("keys", type_=ARRAY(LargeBinary))),
+    JWTBlacklistRecord.expires_at > func.now()
+)
+
+_insert = insert(JWTBlacklistRecord).values(key=bindparam("key"), expires_at=EXPIRES_AT)
+# A record is never shortened, whatever order the writes complete in.
+UPSERT_RECORD = _insert.on_conflict_do_update(
+    index_elements=[JWTBlacklistRecord.key],
+    set_={"expires_at": func.greatest(JWTBlacklistRecord.expires_at, _insert.excluded.expires_at)}
+)
+# An expired record, not swept yet, is replaced as if it were absent.
+INSERT_RECORD_IF_ABSENT = _insert.on_conflict_do_update(
+    index_elements=[JWTBlacklistRecord.key],
+    set_={"expires_at": _insert.excluded.expires_at},
+    where=JWTBlacklistRecord.expires_at <= func.now()
+).returning(JWTBlacklistRecord.key)
+
+DELETE_EXPIRED_RECORDS = delete(JWTBlacklistRecord).where(
+    JWTBlacklistRecord.expires_at <= func.now()
+)
+
+
+class PostgresBlacklistBackend(JWTBlacklistBackend):
+    """
+    Stores the records in the unlogged 'jwt_blacklist' table of the
+    primary database, for deployments without Redis.
+
+    Expired records are ignored by every operation, and deleted
+    by sweep(), which must be run periodically.
+
+    Notes:
+      Concurrent add_if_absent() calls for the same key are serialized
+      by its primary key, so exactly one of them inserts the record.
+    """
+
+    def __init__(self, engine: "AsyncEngine"):
+        self._engine = engine
+
+    async def contains(self, lookups: list[Lookup]) -> list[bool]:
+        async with self._engine.connect() as connection:
+            result = await connection.execute(
+                SELECT_LIVE_KEYS, {"keys": [key for key, _ in lookups]}
+            )
+        live_keys = set(result.scalars())
+        return [key in live_keys for key, _ in lookups]
+
+    async def add(self, key: bytes, lifetime: int) -> None:
+        async with self._engine.begin() as connection:
+            await connection.execute(
+                UPSERT_RECORD, {"key": key, "lifetime": timedelta(seconds=lifetime)}
+            )
+
+    async def add_if_absent(self,
+                            key: bytes,
+                            lifetime: int,
+                            legacy_key: str | None = None) -> bool:
+        async with self._engine.begin() as connection:
+            result = await connection.execute(
+                INSERT_RECORD_IF_ABSENT, {"key": key, "lifetime": timedelta(seconds=lifetime)}
+            )
+            return result.first() is not None
+
+    async def sweep(self) -> int:
+        """
+        Returns: The number of expired records deleted.
+        """
+        async with self._engine.begin() as connection:
+            result = await connection.execute(DELETE_EXPIRED_RECORDS)
+        return result.rowcount
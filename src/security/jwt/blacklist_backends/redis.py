@@ -0,0 +1,100 @@
+from typing import TYPE_CHECKING
+
+from src.security.jwt.blacklist_backends.base import JWTBlacklistBackend, Lookup
+
+if TYPE_CHECKING:
+    from aioredis import Redis
+
+    from src.security.jwt.blacklist_filter import JWTBlacklistFilter
+
+
+class RedisBlacklistBackend(JWTBlacklistBackend):
+    """
+    Stores the records as Redis keys expiring by themselves.
+
+    Optionally, lookups of keys that are certainly not stored are
+    answered locally by a JWTBlacklistFilter, to which every new key
+    is published.
+    """
+
+    _ADD_IF_ABSENT_LEGACY_SCRIPT = """
+    if redis.call('EXISTS', KEYS[2]) == 1 then
+        return 0
+    end
+    if redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2], 'NX') then
+        return 1
+    end
+    return 0
+    """
+
+    def __init__(self,
+                 redis_storage: "Redis",
+                 blacklist_filter: "JWTBlacklistFilter | None" = None):
+        """
+        Args:
+          blacklist_filter:
+            If given, it's consulted before Redis. It only covers
+            JSON Web Tokens having 'jti'.
+        """
+        self._redis_storage = redis_storage
+        # Zero is used as the value for each
+        # record because we only work with keys.
+        self._default_value = 0
+        self._add_if_absent_legacy = redis_storage.register_script(
+            self._ADD_IF_ABSENT_LEGACY_SCRIPT
+        )
+        self._filter = blacklist_filter
+
+    def might_contain(self, key: bytes) -> bool:
+        return self._filter is None or self._filter.might_contain(key)
+
+    async def contains(self, lookups: list[Lookup]) -> list[bool]:
+        if len(lookups) == 1:
+            key, legacy_key = lookups[0]
+            keys = [key] if legacy_key is None else [key, legacy_key]
+            return [bool(await self._redis_storage.exists(*keys))]
+
+        pipeline = self._redis_storage.pipeline(transaction=False)
+        for key, legacy_key in lookups:
+            keys = [key] if legacy_key is None else [key, legacy_key]
+            pipeline.exists(*keys)
+        return [bool(records) for records in await pipeline.execute()]
+
+    async def add(self, key: bytes, lifetime: int) -> None:
+        if self._filter is None:
+            await self._redis_storage.set(key, self._default_value, lifetime)
+            return
+
+        pipeline = self._redis_storage.pipeline(transaction=False)
+        pipeline.set(key, self._default_value, lifetime)
+        pipeline.publish(self._filter.channel, key)
+        await pipeline.execute()
+
+    async def add_if_absent(self,
+                            key: bytes,
+                            lifetime: int,
+                            legacy_key: str | None = None) -> bool:
+        if legacy_key is not None:
+            is_set = await self._add_if_absent_legacy(
+                keys=[key, legacy_key], args=[self._default_value, lifetime]
+            )
+        elif self._filter is None:
+            is_set = await self._redis_storage.set(
+                key, self._default_value, ex=lifetime, nx=True
+            )
+        else:
+            # Publishing a key that's already stored is harmless,
+            # and it keeps the whole operation in one round trip.
+            pipeline = self._redis_storage.pipeline(transaction=False)
+            pipeline.set(key, self._default_value, ex=lifetime, nx=True)
+            pipeline.publish(self._filter.channel, key)
+            is_set, _ = await pipeline.execute()
+        return bool(is_set)
+
+    def start(self) -> None:
+        if self._filter is not None:
+            self._filter.start()
+
+    async def stop(self) -> None:
+        if self._filter is not None:
+            await self._filter.stop()
@@ -0,0 +1,202 @@
+import fcntl
+import math
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+from hashlib import blake2b
+from pathlib import Path
+from typing import Iterator
+
+from src.security.jwt.blacklist_backends.base import JWTBlacklistBackend, Lookup
+
+
+class SharedMemoryBlacklistFull(Exception):
+    """
+    Raised when a key can't be stored, as every slot
+    it may be stored in holds a live record.
+    """
+
+
+class SharedMemoryBlacklistBackend(JWTBlacklistBackend):
+    """
+    Stores the records in a fixed-size hash table, in a memory-mapped
+    file shared by the worker processes of a single host.
+
+    The table is open-addressed with linear probing. Each slot holds
+    a 16-byte digest of its key and the time it expires at, in seconds
+    since the epoch, 0 marking a slot that has never been used. Expired
+    slots are reused in place, so the table is never swept, and a key
+    is only ever stored within MAX_PROBES slots of its home slot, so
+    a lookup reads a bounded window however full the table has been.
+    The table has MAX_PROBES spare slots at its end, so that no window
+    wraps around.
+
+    Lookups hold a shared flock of the file and writes an exclusive one,
+    which makes add_if_absent() atomic across the processes. Every
+    operation takes microseconds and doesn't await, so it runs inline.
+
+    Notes:
+      The file is created, or checked to match the capacity, on first
+      use. On a tmpfs, such as /dev/shm, it lives until the host reboots.
+    """
+
+    MAGIC = b"JWTBL\x00\x00\x01"
+    MAX_PROBES = 64
+
+    # The magic and the capacity.
+    _HEADER = struct.Struct("<8sQ")
+    _DIGEST_SIZE = 16
+    # The digest of the key and the time it expires at.
+    _SLOT = struct.Struct(f"<{_DIGEST_SIZE}sQ")
+    _EXPIRES_AT = struct.Struct("<Q")
+
+    def __init__(self, path: Path, capacity: int):
+        """
+        Args:
+          capacity:
+            The number of slots. Keep the table at most half full,
+            otherwise a key may find no free slot in its window.
+        """
+        self.path = path
+        self.capacity = capacity
+        self._size = self._HEADER.size + (capacity + self.MAX_PROBES) * self._SLOT.size
+        self._window_size = self.MAX_PROBES * self._SLOT.size
+
+        self._file_descriptor: int | None = None
+        self._map: mmap.mmap | None = None
+
+    def _open(self) -> mmap.mmap:
+        """
+        Returns: The mapped table, which is created if the file is empty.
+
+        Raises:
+          ValueError: If the file holds a different table.
+        """
+        if self._map is not None:
+            return self._map
+
+        header = self._HEADER.pack(self.MAGIC, self.capacity)
+        file_descriptor = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            with self._lock(file_descriptor, fcntl.LOCK_EX):
+                size = os.fstat(file_descriptor).st_size
+                if size == 0:
+                    os.ftruncate(file_descriptor, self._size)
+                    os.pwrite(file_descriptor, header, 0)
+                elif size != self._size or os.pread(file_descriptor, len(header), 0) != header:
+                    raise ValueError(
+                        f"{self.path} doesn't hold a blacklist table of {self.capacity} slots."
+                    )
+            self._map = mmap.mmap(file_descriptor, self._size)
+        except BaseException:
+            os.close(file_descriptor)
+            raise
+        self._file_descriptor = file_descriptor
+        return self._map
+
+    @staticmethod
+    @contextmanager
+    def _lock(file_descriptor: int, operation: int) -> Iterator[None]:
+        fcntl.flock(file_descriptor, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(file_descriptor, fcntl.LOCK_UN)
+
+    def _locate(self, key: bytes) -> tuple[bytes, int]:
+        """
+        Returns: The digest stored for the key, and the
+                 offset of the first slot of its window.
+        """
+        digest = blake2b(key, digest_size=self._DIGEST_SIZE).digest()
+        home = int.from_bytes(digest[:8], "little") % self.capacity
+        return digest, self._HEADER.size + home * self._SLOT.size
+
+    def _find(self, window: bytes, digest: bytes) -> int | None:
+        """
+        Returns: The offset in the window of the slot holding the digest, if any.
+        """
+        position = window.find(digest)
+        # A match may straddle two slots.
+        while position != -1 and position % self._SLOT.size:
+            position = window.find(digest, position + 1)
+        return None if position == -1 else position
+
+    def _get_expiry(self, window: bytes, position: int) -> int:
+        return self._EXPIRES_AT.unpack_from(window, position + self._DIGEST_SIZE)[0]
+
+    def _is_live(self, table: mmap.mmap, key: bytes, now: float) -> bool:
+        digest, start = self._locate(key)
+        window = table[start:start + self._window_size]
+        position = self._find(window, digest)
+        return position is not None and self._get_expiry(window, position) > now
+
+    @staticmethod
+    def _get_expiry_time(lifetime: int) -> int:
+        # Rounded up, so that a record never expires early.
+        return math.ceil(time.time()) + lifetime
+
+    def _store(self, table: mmap.mmap, key: bytes, expires_at: int, only_if_absent: bool) -> bool:
+        """
+        Must be called with the exclusive lock held.
+
+        Returns: A Boolean value designating whether the key has been stored.
+
+        Raises:
+          SharedMemoryBlacklistFull: If no slot of the window is free.
+        """
+        now = time.time()
+        digest, start = self._locate(key)
+        window = table[start:start + self._window_size]
+
+        position = self._find(window, digest)
+        if position is not None:
+            current_expiry = self._get_expiry(window, position)
+            if current_expiry > now and (only_if_absent or current_expiry >= expires_at):
+                return False
+        else:
+            position = next(
+                (
+                    position
+                    for position in range(0, self._window_size, self._SLOT.size)
+                    if self._get_expiry(window, position) <= now
+                ),
+                None
+            )
+            if position is None:
+                raise SharedMemoryBlacklistFull(
+                    f"No slot is free for the key, {self.path} holds too many records."
+                )
+
+        self._SLOT.pack_into(table, start + position, digest, expires_at)
+        return True
+
+    async def contains(self, lookups: list[Lookup]) -> list[bool]:
+        table = self._open()
+        now = time.time()
+        with self._lock(self._file_descriptor, fcntl.LOCK_SH):
+            return [self._is_live(table, key, now) for key, _ in lookups]
+
+    async def add(self, key: bytes, lifetime: int) -> None:
+        table = self._open()
+        with self._lock(self._file_descriptor, fcntl.LOCK_EX):
+            self._store(table, key, self._get_expiry_time(lifetime), only_if_absent=False)
+
+    async def add_if_absent(self,
+                            key: bytes,
+                            lifetime: int,
+                            legacy_key: str | None = None) -> bool:
+        table = self._open()
+        with self._lock(self._file_descriptor, fcntl.LOCK_EX):
+            return self._store(table, key, self._get_expiry_time(lifetime), only_if_absent=True)
+
+    def start(self) -> None:
+        self._open()
+
+    async def stop(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            os.close(self._file_descriptor)
+            self._map = self._file_descriptor = None
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+from src.database.redis import Subscription
+from src.security.jwt.bloom import BloomFilter
+
+if TYPE_CHECKING:
+    from aioredis import Redis
+
+
+logger = logging.getLogger(__name__)
+
+
+class JWTBlacklistFilter:
+    """
+    Almost every JSON Web Token being checked isn't blacklisted,
+    so asking Redis about each of them is mostly wasted.
+
+    This class keeps a per-process Bloom filter of the blacklist record
+    keys. When the filter says a key is absent, it's absent for sure,
+    and Redis isn't queried. Blacklisted keys are published to a Redis
+    channel so that every process adds them to its filter, and the filter
+    is periodically rebuilt from Redis to let expired records age out.
+
+    Notes:
+      While the subscription is down, or the filter hasn't been built
+      yet, the filter can't be trusted, and every lookup goes to Redis.
+
+      A key blacklisted by another process is seen only once its
+      message is delivered, usually within milliseconds. That's why
+      one-shot JSON Web Tokens never rely on the filter.
+    """
+
+    channel = "jwt:bl:added"
+
+    def __init__(self,
+                 redis_storage: "Redis",
+                 namespace: bytes,
+                 false_positive_rate: float,
+                 max_size: int,
+                 rebuild_interval: float):
+        """
+        Args:
+          namespace:
+            The prefix shared by all blacklist record keys.
+
+          false_positive_rate:
+            The desired share of absent keys reported as present.
+
+          max_size:
+            The maximum size of the filter, in bytes.
+
+          rebuild_interval:
+            The number of seconds between rebuilds.
+        """
+        self._redis_storage = redis_storage
+        self._namespace = namespace
+        self._false_positive_rate = false_positive_rate
+        self._max_size = max_size
+        self._rebuild_interval = rebuild_interval
+
+        self._bloom_filter: BloomFilter | None = None
+        # Keys received while a rebuild is scanning Redis,
+        # they are added to the new filter once it's ready.
+        self._keys_received_during_rebuild: list[bytes] | None = None
+
+        self._subscription = Subscription(
+            redis_storage,
+            self.channel,
+            on_message=self._add,
+            on_subscribe=self.rebuild,
+            on_unsubscribe=self._invalidate
+        )
+        self._rebuild_task: asyncio.Task | None = None
+        self._rebuild_lock = asyncio.Lock()
+
+    @property
+    def is_ready(self) -> bool:
+        return self._subscription.is_active and self._bloom_filter is not None
+
+    def might_contain(self, key: bytes) -> bool:
+        """
+        Returns: False if the key is certainly not blacklisted.
+                 True if it may be, or the filter isn't ready.
+        """
+        if not self.is_ready:
+            return True
+        return key in self._bloom_filter
+
+    def _add(self, key: bytes) -> None:
+        if self._bloom_filter is not None:
+            self._bloom_filter.add(key)
+        if self._keys_received_during_rebuild is not None:
+            self._keys_received_during_rebuild.append(key)
+
+    def _invalidate(self) -> None:
+        self._bloom_filter = None
+
+    async def rebuild(self) -> None:
+        """
+        Replaces the filter by a new one built
+        from the keys currently stored in Redis.
+        """
+        async with self._rebuild_lock:
+            self._keys_received_during_rebuild = []
+            try:
+                keys = [
+                    key async for key in self._redis_storage.scan_iter(
+                        match=self._namespace + b"*", count=1000
+                    )
+                ]
+                # Headroom for the keys blacklisted until the next rebuild.
+                bloom_filter = BloomFilter(
+                    max(len(keys) * 2, 10_000),
+                    self._false_positive_rate,
+                    self._max_size
+                )
+                for key in keys + self._keys_received_during_rebuild:
+                    bloom_filter.add(key)
+            finally:
+                self._keys_received_during_rebuild = None
+
+            # The subscription might have been dropped during the scan.
+            if self._subscription.is_active:
+                self._bloom_filter = bloom_filter
+
+    async def _rebuild_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._rebuild_interval)
+            if not self._subscription.is_active:
+                continue
+            try:
+                await self.rebuild()
+            except Exception:  # noqa
+                logger.warning("The blacklist filter rebuild has failed.", exc_info=True)
+
+    def start(self) -> None:
+        self._subscription.start()
+        if self._rebuild_task is None:
+            self._rebuild_task = asyncio.create_task(self._rebuild_periodically())
+
+    async def stop(self) -> None:
+        if self._rebuild_task is not None:
+            self._rebuild_task.cancel()
+            self._rebuild_task = None
+        await self._subscription.stop()
@@ -0,0 +1,53 @@
+from math import ceil, log
+
+
+class BloomFilter:
+    """
+    A probabilistic set: a lookup may report an absent item as
+    present with a bounded probability, but never the opposite.
+
+    Items must be uniformly distributed digests of at least 16
+    bytes, since the bit positions are derived from them directly.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float, max_size: int):
+        """
+        Args:
+          capacity:
+            The expected number of items.
+
+          false_positive_rate:
+            The desired probability of a false positive
+            when the filter holds 'capacity' items.
+
+          max_size:
+            The maximum size of the filter, in bytes. If the desired
+            false positive rate requires more, the filter is truncated
+            and its actual false positive rate is higher.
+        """
+        capacity = max(capacity, 1)
+        desired_bits = ceil(-capacity * log(false_positive_rate) / log(2) ** 2)
+
+        self._size = max(min(desired_bits, max_size * 8), 8)
+        self._hash_count = max(round(self._size / capacity * log(2)), 1)
+        self._bits = bytearray(ceil(self._size / 8))
+
+    def _get_positions(self, item: bytes) -> list[int]:
+        # Double hashing: the i-th position is h1 + i * h2.
+        first_hash = int.from_bytes(item[-16:-8], "little")
+        second_hash = int.from_bytes(item[-8:], "little") | 1
+        return [
+            (first_hash + index * second_hash) % self._size
+            for index in range(self._hash_count)
+        ]
+
+    def add(self, item: bytes) -> None:
+        for position in self._get_positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: bytes) -> bool:
+        bits = self._bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._get_positions(item)
+        )
@@ -0,0 +1,76 @@
+from calendar import timegm
+from collections import OrderedDict
+from datetime import datetime
+from hashlib import blake2b
+
+from src.schemas import JWTClaims
+
+
+class JWTClaimsCache:
+    """
+    Clients present the same JSON Web Token again and again, and
+    verifying its signature and claims gives the same result each
+    time, until the JSON Web Token expires or the key is changed.
+
+    So this class keeps the validated claims sets of recently
+    seen JSON Web Tokens, evicting the least recently used ones.
+    """
+
+    def __init__(self, max_size: int):
+        """
+        Args:
+          max_size:
+            The maximum number of claims sets kept.
+            If it's 0, nothing is cached.
+        """
+        self._max_size = max_size
+        self._entries: OrderedDict[bytes, JWTClaims] = OrderedDict()
+        self._key: object | None = None
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _get_entry_key(jwt: str) -> bytes:
+        return blake2b(jwt.encode(), digest_size=16).digest()
+
+    def bind(self, key: object) -> None:
+        """
+        Flushes the cache if the JSON Web Tokens
+        are now verified with another key.
+        """
+        if key is not self._key:
+            self.clear()
+            self._key = key
+
+    def get(self, jwt: str) -> JWTClaims | None:
+        """
+        Returns: The claims set of the JSON Web Token if it has been
+                 validated and hasn't expired since. Otherwise, None.
+        """
+        entry_key = self._get_entry_key(jwt)
+        claims = self._entries.get(entry_key)
+        if claims is None:
+            self.misses += 1
+            return None
+
+        # A JSON Web Token is valid during the second of its 'exp'.
+        if claims.exp < timegm(datetime.utcnow().utctimetuple()):
+            del self._entries[entry_key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(entry_key)
+        self.hits += 1
+        return claims
+
+    def set(self, jwt: str, claims: JWTClaims) -> None:
+        if self._max_size <= 0:
+            return
+
+        self._entries[self._get_entry_key(jwt)] = claims
+        if len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -0,0 +1,152 @@
+from collections import OrderedDict
+from typing import Iterable, TYPE_CHECKING
+
+from src.database.redis import Subscription, redis
+from src.settings import settings
+
+if TYPE_CHECKING:
+    from aioredis import Redis
+
+
+class JWTGenerations:
+    """
+    Revokes every access token of a user at once.
+
+    Each user has a generation, 0 at first, which is stamped into their
+    access tokens as the 'gen' claim. Bumping it makes all the tokens
+    stamped with an older generation invalid, so revoking them costs a
+    single write, however many tokens have been issued.
+
+    Generations are kept in Redis hashes of BUCKET_SIZE users each,
+    small enough to be stored by Redis in its compact encoding. Each
+    process caches the generations it has read, and every bump is
+    broadcast with the new generation, which the processes apply.
+
+    Notes:
+      Generations only grow, so a cached generation is only ever
+      replaced by a greater one, whatever order the bumps and reads
+      complete in. While the subscription is down, a process may miss
+      bumps, so its cache is bypassed until it's back.
+    """
+
+    namespace = "jwt:generations"
+    # Each message is "<user identifier>:<generation>".
+    channel = "jwt:generations:bumped"
+    # Redis encodes hashes of up to 128 fields compactly by default.
+    BUCKET_SIZE = 100
+
+    # KEYS: bucket.
+    # ARGV: field, user identifier, channel.
+    _BUMP_SCRIPT = """
+    local generation = redis.call('HINCRBY', KEYS[1], ARGV[1], 1)
+    redis.call('PUBLISH', ARGV[3], ARGV[2] .. ':' .. generation)
+    return generation
+    """
+
+    def __init__(self, redis_storage: "Redis", max_size: int):
+        """
+        Args:
+          max_size:
+            The maximum number of generations kept by each process.
+            If it's 0, the cache is disabled.
+        """
+        self._redis_storage = redis_storage
+        self._max_size = max_size
+
+        self._generations: OrderedDict[int, int] = OrderedDict()
+        self._subscription = Subscription(
+            redis_storage,
+            self.channel,
+            on_message=self._apply,
+            on_unsubscribe=self._generations.clear
+        )
+        self._bump = redis_storage.register_script(self._BUMP_SCRIPT)
+
+    def _locate(self, user_id: int) -> tuple[str, str]:
+        """
+        Returns: The key of the hash holding the user's generation, and its field.
+        """
+        bucket, field = divmod(user_id, self.BUCKET_SIZE)
+        return f"{self.namespace}:{bucket}", str(field)
+
+    @property
+    def _is_cache_usable(self) -> bool:
+        return self._max_size > 0 and self._subscription.is_active
+
+    def _remember(self, user_id: int, generation: int) -> int:
+        """
+        Returns: The greatest known generation of the user.
+        """
+        if not self._is_cache_usable:
+            return generation
+
+        generation = max(generation, self._generations.get(user_id, 0))
+        self._generations[user_id] = generation
+        self._generations.move_to_end(user_id)
+        if len(self._generations) > self._max_size:
+            self._generations.popitem(last=False)
+        return generation
+
+    def _apply(self, message: bytes) -> None:
+        user_id, generation = message.split(b":")
+        self._remember(int(user_id), int(generation))
+
+    async def get(self, user_id: int, cached: bool = True) -> int:
+        """
+        Args:
+          cached:
+            If False, the generation is read from Redis, e.g. to issue
+            a token right after the generation may have been bumped.
+
+        Returns: The current generation of the user.
+        """
+        if cached and self._is_cache_usable:
+            generation = self._generations.get(user_id)
+            if generation is not None:
+                self._generations.move_to_end(user_id)
+                return generation
+
+        generation = await self._redis_storage.hget(*self._locate(user_id))
+        return self._remember(user_id, int(generation or 0))
+
+    async def get_many(self, user_ids: Iterable[int]) -> dict[int, int]:
+        """
+        Returns: The current generations of the users, those
+                 not cached being read in a single pipelined request.
+        """
+        generations = {}
+        missing_user_ids = []
+        for user_id in set(user_ids):
+            generation = self._generations.get(user_id) if self._is_cache_usable else None
+            if generation is None:
+                missing_user_ids.append(user_id)
+            else:
+                generations[user_id] = generation
+
+        if missing_user_ids:
+            pipeline = self._redis_storage.pipeline(transaction=False)
+            for user_id in missing_user_ids:
+                pipeline.hget(*self._locate(user_id))
+            for user_id, generation in zip(missing_user_ids, await pipeline.execute()):
+                generations[user_id] = self._remember(user_id, int(generation or 0))
+        return generations
+
+    async def bump(self, user_id: int) -> int:
+        """
+        Revokes every access token of the user issued so far.
+
+        Returns: The new generation of the user.
+        """
+        key, field = self._locate(user_id)
+        generation = await self._bump(keys=[key], args=[field, user_id, self.channel])
+        return self._remember(user_id, generation)
+
+    def start(self) -> None:
+        if self._max_size > 0:
+            self._subscription.start()
+
+    async def stop(self) -> None:
+        await self._subscription.stop()
+
+
+generations = JWTGenerations(redis, settings.JWT_GENERATIONS_CACHE_MAX_SIZE)
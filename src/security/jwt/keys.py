@@ -0,0 +1,198 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from secrets import token_hex
+from typing import Any
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import jwk
+
+from src.settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SigningKey:
+    kid: str
+    algorithm: str
+    created_at: datetime
+    private_key: jwk.Key = field(repr=False)
+    public_key: jwk.Key = field(repr=False)
+
+    @property
+    def public_jwk(self) -> dict[str, Any]:
+        return {
+            **self.public_key.to_dict(),
+            "kid": self.kid,
+            "alg": self.algorithm,
+            "use": "sig"
+        }
+
+
+def generate_private_key(algorithm: str) -> bytes:
+    """
+    Returns: A new private key in the PEM format.
+    """
+    if algorithm.startswith("RS"):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    elif algorithm == "ES256":
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    else:
+        raise ValueError(f"Keys for {algorithm} can't be generated.")
+
+    return private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    )
+
+
+class JWTKeyRing:
+    """
+    Asymmetrically signed JSON Web Tokens can be verified by anyone
+    having the public key, so other services don't have to call this
+    one, and don't need any secret to verify an access token.
+
+    This class keeps the private keys in a directory shared by all the
+    application processes. The newest key signs new JSON Web Tokens, and
+    a new key is generated once it's older than the rotation interval.
+    A replaced key is kept, and published, for the overlap period, so
+    that JSON Web Tokens it has signed remain verifiable until expiry.
+
+    Notes:
+      A new key starts signing only once it has been published for
+      the JWKS max age, so that the caches of other services have
+      picked it up by then.
+
+      The name of each key file is its 'kid', which starts with the
+      key creation timestamp.
+    """
+
+    def __init__(self,
+                 algorithm: str,
+                 directory: Path,
+                 rotation_interval: timedelta,
+                 overlap: timedelta,
+                 publication_delay: timedelta):
+        self._algorithm = algorithm
+        self._directory = directory
+        self._rotation_interval = rotation_interval
+        self._overlap = overlap
+        self._publication_delay = publication_delay
+
+        self._keys: dict[str, SigningKey] = {}
+        self._jwks_document: tuple[bytes, str] | None = None
+        # Replaced whenever the set of keys changes, so
+        # that caches of verified claims can be flushed.
+        self.version = object()
+
+    def _load_key(self, path: Path) -> SigningKey:
+        created_at = datetime.utcfromtimestamp(int(path.stem.split("-")[0]))
+        private_key = jwk.construct(path.read_bytes(), self._algorithm)
+        return SigningKey(
+            path.stem,
+            self._algorithm,
+            created_at,
+            private_key,
+            private_key.public_key()
+        )
+
+    def _create_key(self) -> None:
+        kid = f"{int(datetime.utcnow().timestamp())}-{token_hex(4)}"
+        path = self._directory / f"{kid}.pem"
+
+        file_descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(file_descriptor, "wb") as file:
+            file.write(generate_private_key(self._algorithm))
+        logger.info("The JSON Web Token key %s has been created.", kid)
+
+    def _rotate(self, keys: list[SigningKey]) -> bool:
+        """
+        Creates a new key if the newest one is too old, and
+        deletes keys replaced for longer than the overlap period.
+
+        Returns: A Boolean value designating whether any
+                 key file has been created or deleted.
+        """
+        now = datetime.utcnow()
+        is_changed = False
+
+        if not keys or keys[-1].created_at + self._rotation_interval <= now:
+            self._create_key()
+            is_changed = True
+
+        for key, successor in zip(keys, keys[1:]):
+            if successor.created_at + self._publication_delay + self._overlap <= now:
+                (self._directory / f"{key.kid}.pem").unlink(missing_ok=True)
+                logger.info("The JSON Web Token key %s has been retired.", key.kid)
+                is_changed = True
+        return is_changed
+
+    def _read_keys(self) -> list[SigningKey]:
+        keys = [self._load_key(path) for path in self._directory.glob("*.pem")]
+        return sorted(keys, key=lambda key: key.created_at)
+
+    def refresh(self) -> None:
+        """
+        Rotates the keys if it's due, and reloads them from the
+        directory, picking up the rotations made by other processes.
+        """
+        self._directory.mkdir(parents=True, exist_ok=True)
+        with open(self._directory / ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            keys = self._read_keys()
+            if self._rotate(keys):
+                keys = self._read_keys()
+
+        if [key.kid for key in keys] != list(self._keys):
+            self._keys = {key.kid: key for key in keys}
+            self._jwks_document = None
+            self.version = object()
+
+    def _ensure_loaded(self) -> None:
+        if not self._keys:
+            self.refresh()
+
+    @property
+    def signing_key(self) -> SigningKey:
+        self._ensure_loaded()
+        keys = list(self._keys.values())
+
+        published_before = datetime.utcnow() - self._publication_delay
+        published_keys = [key for key in keys if key.created_at <= published_before]
+        return published_keys[-1] if published_keys else keys[-1]
+
+    def get_verification_key(self, kid: str | None) -> SigningKey | None:
+        self._ensure_loaded()
+        return self._keys.get(kid)
+
+    def get_jwks_document(self) -> tuple[bytes, str]:
+        """
+        Returns: The JSON Web Key Set of the public keys, and its ETag.
+        """
+        self._ensure_loaded()
+        if self._jwks_document is None:
+            document = json.dumps(
+                {"keys": [key.public_jwk for key in self._keys.values()]},
+                separators=(",", ":")
+            ).encode()
+            etag = '"{}"'.format(hashlib.sha256(document).hexdigest()[:32])
+            self._jwks_document = document, etag
+        return self._jwks_document
+
+
+keyring = JWTKeyRing(
+    settings.JWT_ALGORITHM,
+    settings.JWT_KEYS_DIRECTORY,
+    settings.JWT_KEY_ROTATION_INTERVAL,
+    settings.JWT_KEY_OVERLAP,
+    timedelta(seconds=settings.JWKS_MAX_AGE)
+) if settings.JWT_ALGORITHM != "HS256" else None
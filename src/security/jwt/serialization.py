@@ -1,9 +1,21 @@
+import hmac
+import json
+from calendar import timegm
 from datetime import datetime
-from typing import TYPE_CHECKING
+from functools import lru_cache
+from hashlib import sha256
+from secrets import token_urlsafe
+from typing import TYPE_CHECKING, Any
 
-from jose.jwt import encode, decode
+from jose import jwk, jws
+from jose.jwt import JWTError, encode, decode, get_unverified_header
+from jose.utils import base64url_decode, base64url_encode
 
+from src.metrics import timed
+from src.metrics.instruments import JWT_DECODE_SECONDS, JWT_ISSUED
 from src.schemas import JWTClaims
+from src.security.jwt.claims_cache import JWTClaimsCache
+from src.security.jwt.keys import keyring
 from src.security.jwt.mission import JWTMission
 from src.settings import settings
 
@@ -11,32 +23,155 @@ if TYPE_CHECKING:
     from datetime import timedelta
 
 
-def create_jwt(sub: str, mission: JWTMission, lifetime: "timedelta") -> str:
+claims_cache = JWTClaimsCache(settings.JWT_CLAIMS_CACHE_MAX_SIZE)
+
+
+def create_jwt(sub: str,
+               mission: JWTMission,
+               lifetime: "timedelta",
+               generation: int | None = None) -> str:
     """
     Returns: A new JSON Web Token with the given lifetime.
-             Its claims set includes the 'sub' and 'mission'.
+             Its claims set includes the 'sub', 'mission' and
+             a random 'jti' identifying this JSON Web Token, and
+             the 'gen' of the user, if a generation is given.
     """
     claims = {
         "sub": sub,
         "exp": datetime.utcnow() + lifetime,
-        "mission": mission
+        "mission": mission,
+        "jti": token_urlsafe(12)
     }
-    return encode(claims, settings.SECRET_TOKEN, settings.JWT_ALGORITHM)
+    if generation is not None:
+        claims["gen"] = generation
+    JWT_ISSUED.labels(getattr(mission, "value", mission)).inc()
+    if keyring is None:
+        return encode(claims, settings.SECRET_TOKEN, settings.JWT_ALGORITHM)
+
+    signing_key = keyring.signing_key
+    return encode(
+        claims,
+        signing_key.private_key,
+        signing_key.algorithm,
+        headers={"kid": signing_key.kid}
+    )
+
+
+# The header of every HS256 JSON Web Token created by create_jwt.
+HS256_HEADER_SEGMENT = base64url_encode(b'{"alg":"HS256","typ":"JWT"}')
+# The claims that can be checked on the fast path,
+# JSON Web Tokens with other claims are decoded by jose.
+FAST_PATH_CLAIMS = frozenset(("sub", "exp", "mission", "jti", "gen"))
+
+
+@lru_cache(maxsize=1)
+def _get_hs256_key(secret: str) -> bytes | None:
+    """
+    Returns: The HMAC key jose would use for the secret,
+             or None if jose would interpret it otherwise.
+    """
+    if jws._get_keys(secret) != (secret,):  # noqa
+        return None
+    try:
+        return jwk.construct(secret, "HS256").prepared_key
+    except jwk.JWKError:
+        return None
+
+
+def _decode_hs256(jwt: str, key: bytes) -> dict[str, Any] | None:
+    """
+    Returns: The claims set of an HS256 JSON Web Token of the exact
+             shape create_jwt produces, if the JSON Web Token is valid.
+             Otherwise, None, even if jose could accept the JSON Web
+             Token, so it's up to jose to accept or reject it.
+    """
+    try:
+        token = jwt.encode()
+        signing_input, signature_segment = token.rsplit(b".", 1)
+        header_segment, claims_segment = signing_input.split(b".", 1)
+    except (UnicodeError, ValueError):
+        return None
+    if header_segment != HS256_HEADER_SEGMENT:
+        return None
+
+    try:
+        signature = base64url_decode(signature_segment)
+        claims = json.loads(base64url_decode(claims_segment).decode("utf-8"))
+    except ValueError:
+        return None
 
+    expected_signature = hmac.new(key, signing_input, sha256).digest()
+    if not hmac.compare_digest(signature, expected_signature):
+        return None
 
+    if not isinstance(claims, dict) or not claims.keys() <= FAST_PATH_CLAIMS:
+        return None
+
+    # The same checks jose makes for these claims.
+    exp = claims.get("exp")
+    if type(exp) is not int or exp < timegm(datetime.utcnow().utctimetuple()):
+        return None
+    if not isinstance(claims.get("sub", ""), str):
+        return None
+    if not isinstance(claims.get("jti", ""), str):
+        return None
+    return claims
+
+
+def _decode_signed_by_keyring(jwt: str) -> dict[str, Any]:
+    """
+    Returns: The claims set of a JSON Web Token
+             signed by one of the key ring keys.
+
+    Raises:
+      jose.JWTError: The same as decode_jwt.
+    """
+    kid = get_unverified_header(jwt).get("kid")
+    verification_key = keyring.get_verification_key(kid)
+    if verification_key is None:
+        raise JWTError("The JSON Web Token was signed by an unknown key.")
+
+    return decode(jwt, verification_key.public_key, verification_key.algorithm)
+
+
+@timed(JWT_DECODE_SECONDS)
 def decode_jwt(jwt: str) -> JWTClaims:
     """
     Returns: A JWTClaims instance
              containing the JSON Web Token claims.
 
+             The signature and claims are only checked the first
+             time the JSON Web Token is seen, the result is cached
+             until it expires or the secret/set of keys changes.
+
     Raises:
       jose.JWTError:
         If the JSON Web Token signature/any of its
         claims is invalid.
 
-      pydantic.ValidationError:
+      src.schemas.InvalidJWTClaims:
         If the JWT claims set doesn't contain a
         required claim, or its type isn't serializable.
     """
-    claims = decode(jwt, settings.SECRET_TOKEN, settings.JWT_ALGORITHM)
-    return JWTClaims(**claims)
+    if keyring is None:
+        claims_cache.bind(settings.SECRET_TOKEN)
+    else:
+        claims_cache.bind(keyring.version)
+
+    claims = claims_cache.get(jwt)
+    if claims is not None:
+        return claims
+
+    decoded_claims = None
+    if keyring is not None:
+        decoded_claims = _decode_signed_by_keyring(jwt)
+    elif settings.JWT_FAST_DECODING:
+        key = _get_hs256_key(settings.SECRET_TOKEN)
+        if key is not None:
+            decoded_claims = _decode_hs256(jwt, key)
+    if decoded_claims is None:
+        decoded_claims = decode(jwt, settings.SECRET_TOKEN, settings.JWT_ALGORITHM)
+
+    claims = JWTClaims.parse(decoded_claims)
+    claims_cache.set(jwt, claims)
+    return claims
@@ -1,12 +1,183 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Any
+
 from passlib.context import CryptContext
 
+from src.metrics import timed
+from src.metrics.instruments import PASSWORD_HASHING_SECONDS
+from src.settings import settings
+
+
+def create_crypt_context(bcrypt_rounds: int = settings.BCRYPT_ROUNDS,
+                         argon2_time_cost: int = settings.ARGON2_TIME_COST) -> CryptContext:
+    """
+    Returns: A CryptContext hashing new passwords with the first of
+             the configured schemes. Hashes made by other schemes, or
+             with other costs, are reported as needing an update.
+    """
+    return CryptContext(
+        schemes=settings.PASSWORD_HASHING_SCHEMES,
+        deprecated="auto",
+        # Both bounds are pinned, so that lowering
+        # the cost is propagated on login too.
+        bcrypt__rounds=bcrypt_rounds,
+        bcrypt__min_rounds=bcrypt_rounds,
+        bcrypt__max_rounds=bcrypt_rounds,
+        argon2__type="ID",
+        argon2__rounds=argon2_time_cost,
+        argon2__memory_cost=settings.ARGON2_MEMORY_COST,
+        argon2__parallelism=settings.ARGON2_PARALLELISM
+    )
 
-ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+ctx = create_crypt_context()
 
 
 def get_hashed_password(raw_password: str) -> str:
     return ctx.hash(raw_password)
 
 
-def check_password(raw_password: str, hashed_password: str) -> str:
+def check_password(raw_password: str, hashed_password: str) -> bool:
     return ctx.verify(raw_password, hashed_password)
+
+
+def check_and_update_password(raw_password: str,
+                              hashed_password: str) -> tuple[bool, str | None]:
+    """
+    Returns: A Boolean value designating whether the password matches
+             the given hash, and a new hash of the password if the given
+             one was made by a deprecated scheme or with outdated costs.
+    """
+    return ctx.verify_and_update(raw_password, hashed_password)
+
+
+class PasswordHashingOverloaded(Exception):
+    """
+    Raised when too many passwords are already waiting to be
+    hashed or verified, so the caller should try again later.
+    """
+
+
+class PasswordHasher:
+    """
+    bcrypt is deliberately slow, and a single call keeps the CPU busy
+    for hundreds of milliseconds. Called from a coroutine, it would
+    stall every other request handled by the same event loop.
+
+    So this class runs hashing and verification in a bounded pool of
+    worker processes, and the event loop only awaits the result.
+    """
+
+    def __init__(self,
+                 max_workers: int | None,
+                 max_queue_depth: int,
+                 start_method: str):
+        """
+        Args:
+          max_workers:
+            The number of worker processes.
+            If None, the number of CPUs is used.
+
+          max_queue_depth:
+            The maximum number of jobs that may be submitted
+            to the pool at the same time, including running ones.
+
+          start_method:
+            The multiprocessing start method of the worker
+            processes, either 'spawn' or 'forkserver'.
+        """
+        self._max_workers = max_workers
+        self._max_queue_depth = max_queue_depth
+        self._start_method = start_method
+
+        # The pool is created lazily, so that importing this
+        # module (e.g. in a worker process) doesn't spawn anything.
+        self._executor: ProcessPoolExecutor | None = None
+        self._queue_depth = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                self._max_workers,
+                mp_context=multiprocessing.get_context(self._start_method)
+            )
+        return self._executor
+
+    async def _submit(self, function: Callable, *args: Any) -> Any:
+        if self._queue_depth >= self._max_queue_depth:
+            raise PasswordHashingOverloaded
+
+        self._queue_depth += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(), function, *args
+            )
+        finally:
+            self._queue_depth -= 1
+
+    async def hash(self, raw_password: str) -> str:
+        """
+        Returns: The hash of the given password.
+
+        Raises:
+          PasswordHashingOverloaded: If the queue is full.
+        """
+        return await self._submit(get_hashed_password, raw_password)
+
+    async def verify(self, raw_password: str, hashed_password: str) -> bool:
+        """
+        Returns: A Boolean value designating whether
+                 the password matches the given hash.
+
+        Raises:
+          PasswordHashingOverloaded: If the queue is full.
+        """
+        return await self._submit(check_password, raw_password, hashed_password)
+
+    async def verify_and_update(
+        self,
+        raw_password: str,
+        hashed_password: str
+    ) -> tuple[bool, str | None]:
+        """
+        Returns: The same as check_and_update_password.
+
+        Raises:
+          PasswordHashingOverloaded: If the queue is full.
+        """
+        return await self._submit(
+            check_and_update_password, raw_password, hashed_password
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+hasher = PasswordHasher(
+    settings.PASSWORD_HASHING_WORKERS,
+    settings.PASSWORD_HASHING_MAX_QUEUE_DEPTH,
+    settings.PASSWORD_HASHING_START_METHOD
+)
+
+
+@timed(PASSWORD_HASHING_SECONDS, "hash")
+async def hash_password(raw_password: str) -> str:
+    return await hasher.hash(raw_password)
+
+
+@timed(PASSWORD_HASHING_SECONDS, "verify")
+async def verify_password(raw_password: str, hashed_password: str) -> bool:
+    return await hasher.verify(raw_password, hashed_password)
+
+
+@timed(PASSWORD_HASHING_SECONDS, "verify_and_update")
+async def verify_and_update_password(
+    raw_password: str,
+    hashed_password: str
+) -> tuple[bool, str | None]:
+    return await hasher.verify_and_update(raw_password, hashed_password)
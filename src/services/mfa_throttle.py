@@ -0,0 +1,125 @@
+import logging
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
+
+from src.database.redis import redis
+from src.metrics.instruments import MFA_TOKENS_SUPPRESSED
+from src.settings import settings
+
+if TYPE_CHECKING:
+    from aioredis import Redis
+
+
+logger = logging.getLogger(__name__)
+
+
+class MFATokenThrottle:
+    """
+    Each multi-factor authentication token request signs a token and
+    sends an email, so bursts of requests for the same user and mission
+    flood the user's inbox with identical emails.
+
+    So a token is sent for a user and mission only if none has been sent
+    within the cooldown, and fewer than the daily cap have been sent on
+    the current (UTC) day. Suppressed requests are counted per mission
+    and reason in a Redis hash.
+    """
+
+    # KEYS: cooldown, daily counter, suppressed counters.
+    # ARGV: cooldown in milliseconds, daily cap, mission.
+    _ACQUIRE_SCRIPT = """
+    if redis.call('EXISTS', KEYS[1]) == 1 then
+        redis.call('HINCRBY', KEYS[3], ARGV[3] .. ':cooldown', 1)
+        return 'cooldown'
+    end
+    local sent = tonumber(redis.call('GET', KEYS[2]) or '0')
+    if sent >= tonumber(ARGV[2]) then
+        redis.call('HINCRBY', KEYS[3], ARGV[3] .. ':daily-cap', 1)
+        return 'daily-cap'
+    end
+    redis.call('SET', KEYS[1], 1, 'PX', ARGV[1])
+    if redis.call('INCR', KEYS[2]) == 1 then
+        redis.call('EXPIRE', KEYS[2], 86400)
+    end
+    return false
+    """
+
+    # KEYS: cooldown, daily counter.
+    # The counter is left alone if the day has changed since the acquisition.
+    _RELEASE_SCRIPT = """
+    redis.call('DEL', KEYS[1])
+    if tonumber(redis.call('GET', KEYS[2]) or '0') > 0 then
+        redis.call('DECR', KEYS[2])
+    end
+    """
+
+    def __init__(self,
+                 redis_storage: "Redis",
+                 cooldown: timedelta,
+                 daily_cap: int,
+                 namespace: str = "mfa"):
+        self._redis_storage = redis_storage
+        self._cooldown = cooldown
+        self._daily_cap = daily_cap
+        self._namespace = namespace
+        self.suppressed = f"{namespace}:suppressed"
+
+        self._acquire = redis_storage.register_script(self._ACQUIRE_SCRIPT)
+        self._release = redis_storage.register_script(self._RELEASE_SCRIPT)
+
+    def _get_cooldown_key(self, user_id: int, mission: str) -> str:
+        return f"{self._namespace}:cooldown:{user_id}:{mission}"
+
+    def _get_daily_key(self, user_id: int, mission: str) -> str:
+        day = datetime.utcnow().strftime("%Y%m%d")
+        return f"{self._namespace}:daily:{user_id}:{mission}:{day}"
+
+    async def acquire(self, user_id: int, mission: str) -> bool:
+        """
+        Returns: A Boolean value designating whether a token
+                 may be sent, which starts a new cooldown.
+        """
+        reason = await self._acquire(
+            keys=[
+                self._get_cooldown_key(user_id, mission),
+                self._get_daily_key(user_id, mission),
+                self.suppressed
+            ],
+            args=[int(self._cooldown.total_seconds() * 1000), self._daily_cap, mission]
+        )
+        if reason is not None:
+            MFA_TOKENS_SUPPRESSED.labels(mission, reason.decode()).inc()
+            logger.debug(
+                "The %s token of the user %d has been suppressed (%s).",
+                mission,
+                user_id,
+                reason.decode()
+            )
+        return reason is None
+
+    async def release(self, user_id: int, mission: str) -> None:
+        """
+        Ends the cooldown, and gives the token back to the daily cap,
+        if the token couldn't be sent after all.
+        """
+        await self._release(keys=[
+            self._get_cooldown_key(user_id, mission),
+            self._get_daily_key(user_id, mission)
+        ])
+
+    async def get_suppressed_counts(self) -> dict[tuple[str, str], int]:
+        """
+        Returns: The numbers of suppressed requests by mission and reason.
+        """
+        counts = await self._redis_storage.hgetall(self.suppressed)
+        return {
+            tuple(field.decode().rsplit(":", 1)): int(count)
+            for field, count in counts.items()
+        }
+
+
+mfa_throttle = MFATokenThrottle(
+    redis,
+    settings.MFA_TOKEN_COOLDOWN,
+    settings.MFA_TOKEN_DAILY_CAP
+)
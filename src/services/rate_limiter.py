@@ -0,0 +1,166 @@
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from src.database.redis import redis
+from src.metrics.instruments import RATE_LIMITED
+from src.settings import settings
+
+if TYPE_CHECKING:
+    from aioredis import Redis
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Rate:
+    """
+    A token bucket holding up to 'capacity' requests,
+    refilled at 'capacity' requests per 'period' seconds.
+    """
+
+    capacity: int
+    period: float
+
+    _PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+    @classmethod
+    def parse(cls, rate: str) -> "Rate":
+        """
+        Returns: The rate described as "<requests>/<second|minute|hour|day>".
+
+        Raises:
+          ValueError: If the rate is malformed.
+        """
+        capacity, _, period = rate.partition("/")
+        if period not in cls._PERIODS or not capacity.strip().isdigit() or int(capacity) < 1:
+            raise ValueError(f"The rate {rate!r} is malformed.")
+        return cls(int(capacity), cls._PERIODS[period])
+
+    @property
+    def refill_rate(self) -> float:
+        return self.capacity / self.period
+
+
+class RateLimiter:
+    """
+    Limits requests with token buckets stored in Redis.
+
+    A request usually falls under several limits (e.g. per IP address,
+    per email address and globally), so all of its buckets are checked
+    by a single script: either a token is taken from every bucket, or
+    from none of them, and the delay until each empty bucket holds a
+    token again is returned.
+
+    Those delays are remembered by the process, so a client known to be
+    over a limit is rejected without asking Redis until its bucket is
+    refilled. At most 'local_max_size' delays are remembered.
+    """
+
+    # KEYS: buckets.
+    # ARGV: capacity and refill rate per second of each bucket.
+    _HIT_SCRIPT = """
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+    local tokens = {}
+    local delays = {}
+    local is_allowed = true
+    for index, key in ipairs(KEYS) do
+        local capacity = tonumber(ARGV[index * 2 - 1])
+        local refill_rate = tonumber(ARGV[index * 2])
+        local bucket = redis.call('HMGET', key, 'tokens', 'updated_at')
+        tokens[index] = capacity
+        if bucket[1] then
+            tokens[index] = math.min(
+                capacity,
+                tonumber(bucket[1]) + (now - tonumber(bucket[2])) * refill_rate
+            )
+        end
+        delays[index] = '0'
+        if tokens[index] < 1 then
+            delays[index] = tostring((1 - tokens[index]) / refill_rate)
+            is_allowed = false
+        end
+    end
+    if not is_allowed then
+        return delays
+    end
+    for index, key in ipairs(KEYS) do
+        local capacity = tonumber(ARGV[index * 2 - 1])
+        local refill_rate = tonumber(ARGV[index * 2])
+        redis.call('HSET', key, 'tokens', tokens[index] - 1, 'updated_at', now)
+        redis.call('PEXPIRE', key, math.ceil(capacity / refill_rate * 1000))
+    end
+    return delays
+    """
+
+    def __init__(self,
+                 redis_storage: "Redis",
+                 local_max_size: int,
+                 namespace: str = "rate-limits"):
+        self._local_max_size = local_max_size
+        self._namespace = namespace
+        # Buckets by the monotonic time they'll hold a token again.
+        self._blocked_until: OrderedDict[str, float] = OrderedDict()
+
+        self._hit = redis_storage.register_script(self._HIT_SCRIPT)
+
+    def _get_local_delay(self, keys: list[str]) -> float:
+        now = time.monotonic()
+        delay = 0
+        for key in keys:
+            blocked_until = self._blocked_until.get(key)
+            if blocked_until is None:
+                continue
+            if blocked_until <= now:
+                del self._blocked_until[key]
+            else:
+                delay = max(delay, blocked_until - now)
+        return delay
+
+    def _block(self, key: str, delay: float) -> None:
+        self._blocked_until[key] = time.monotonic() + delay
+        self._blocked_until.move_to_end(key)
+        while len(self._blocked_until) > self._local_max_size:
+            self._blocked_until.popitem(last=False)
+
+    async def hit(self, name: str, limits: dict[str, Rate]) -> float:
+        """
+        Takes a token from the bucket of every limit, if each holds one.
+
+        Args:
+          name: The name of the limited operation, e.g. "login".
+          limits: The rates by the identifier of the limited client,
+                  e.g. {"ip:10.0.0.1": Rate(20, 60), "global": Rate(100, 1)}.
+
+        Returns: 0 if the request is allowed, otherwise the number
+                 of seconds after which it may be retried.
+        """
+        keys = [f"{self._namespace}:{name}:{client}" for client in limits]
+
+        delay = self._get_local_delay(keys)
+        if delay:
+            RATE_LIMITED.labels(name, "local").inc()
+            return delay
+
+        args = []
+        for rate in limits.values():
+            args.extend((rate.capacity, rate.refill_rate))
+        delays = [float(delay) for delay in await self._hit(keys=keys, args=args)]
+        if not any(delays):
+            return 0
+
+        for key, delay in zip(keys, delays):
+            if delay:
+                self._block(key, delay)
+        RATE_LIMITED.labels(name, "redis").inc()
+        logger.debug("A request to %s has been rate limited (%s).", name, ", ".join(
+            client for client, delay in zip(limits, delays) if delay
+        ))
+        return max(delays)
+
+
+rate_limiter = RateLimiter(redis, settings.RATE_LIMIT_LOCAL_MAX_SIZE)
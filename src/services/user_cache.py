@@ -0,0 +1,201 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from src.database.redis import Subscription, redis
+from src.schemas import UserSnapshot
+from src.settings import settings
+
+if TYPE_CHECKING:
+    from aioredis import Redis
+
+
+@dataclass(frozen=True)
+class UserCacheTicket:
+    """
+    Taken by a cache miss, before the user is loaded from the database,
+    it tells set() whether the user may have been invalidated since,
+    in which case the loaded snapshot may be stale.
+    """
+
+    # The number of invalidations the process had seen.
+    invalidations: int
+    # The version of the user in Redis, if the Redis tier is enabled.
+    version: bytes | None
+
+
+class UserCache:
+    """
+    User rows are read on every authenticated request,
+    but they're hardly ever changed.
+
+    So this class keeps snapshots of recently read users in two tiers:
+    a per-process LRU with a short lifetime, and, optionally, Redis,
+    shared by all the processes. Every change of a user must be followed
+    by an invalidation, which removes the Redis record and is broadcast
+    to every process to remove their local copies.
+
+    A snapshot loaded after a miss is only cached if the user hasn't
+    been invalidated since the miss, so that a load racing with a change
+    can't cache the previous snapshot again. In Redis, each invalidation
+    bumps a version of the user, which a script compares before caching.
+    Each process counts the invalidations it has seen, and any of them
+    prevents the local caching of snapshots loaded meanwhile.
+
+    Notes:
+      While the invalidation subscription is down, a process may miss
+      invalidations, so its local tier is bypassed until it's back.
+    """
+
+    # Each message is a comma-separated list of user identifiers.
+    channel = "users:invalidated"
+
+    # KEYS: snapshot, version.
+    # ARGV: document, lifetime, version read by the miss.
+    _SET_SCRIPT = """
+    if (redis.call('GET', KEYS[2]) or '') ~= ARGV[3] then
+        return 0
+    end
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    return 1
+    """
+
+    def __init__(self,
+                 redis_storage: "Redis",
+                 max_size: int,
+                 ttl: float,
+                 redis_ttl: int | None):
+        """
+        Args:
+          max_size:
+            The maximum number of users kept by each process.
+            If it's 0, the local tier is disabled.
+
+          ttl:
+            The number of seconds a process keeps a user.
+
+          redis_ttl:
+            The number of seconds Redis keeps a user.
+            If it's None, the Redis tier is disabled.
+        """
+        self._redis_storage = redis_storage
+        self._max_size = max_size
+        self._ttl = ttl
+        self._redis_ttl = redis_ttl
+
+        self._entries: OrderedDict[int, tuple[UserSnapshot, float]] = OrderedDict()
+        self._invalidations = 0
+        self._subscription = Subscription(
+            redis_storage,
+            self.channel,
+            on_message=self._drop,
+            on_unsubscribe=self._entries.clear
+        )
+        self._set = redis_storage.register_script(self._SET_SCRIPT)
+
+    @staticmethod
+    def _get_key(user_id: int) -> str:
+        return f"users:snapshot:{user_id}"
+
+    @staticmethod
+    def _get_version_key(user_id: int) -> str:
+        return f"users:version:{user_id}"
+
+    @property
+    def _is_local_tier_usable(self) -> bool:
+        return self._max_size > 0 and self._subscription.is_active
+
+    def _drop(self, message: bytes) -> None:
+        self._invalidations += 1
+        for user_id in message.split(b","):
+            self._entries.pop(int(user_id), None)
+
+    def _remember(self, snapshot: UserSnapshot, invalidations: int) -> None:
+        if not self._is_local_tier_usable or invalidations != self._invalidations:
+            return
+
+        self._entries[snapshot.id] = snapshot, time.monotonic() + self._ttl
+        self._entries.move_to_end(snapshot.id)
+        if len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    async def get(self, user_id: int) -> tuple[UserSnapshot | None, UserCacheTicket]:
+        """
+        Returns: The cached snapshot of the user, or None, and the ticket
+                 to pass to set() with the snapshot loaded on a miss.
+        """
+        invalidations = self._invalidations
+        if self._is_local_tier_usable:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                snapshot, expires_at = entry
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(user_id)
+                    return snapshot, UserCacheTicket(invalidations, None)
+                del self._entries[user_id]
+
+        if self._redis_ttl is None:
+            return None, UserCacheTicket(invalidations, None)
+
+        document, version = await self._redis_storage.mget(
+            self._get_key(user_id), self._get_version_key(user_id)
+        )
+        ticket = UserCacheTicket(invalidations, version or b"")
+        if document is None:
+            return None, ticket
+
+        snapshot = UserSnapshot.loads(document)
+        self._remember(snapshot, invalidations)
+        return snapshot, ticket
+
+    async def set(self, snapshot: UserSnapshot, ticket: UserCacheTicket) -> None:
+        """
+        Caches the snapshot loaded after a miss, unless the
+        user has been invalidated since the ticket was taken.
+        """
+        self._remember(snapshot, ticket.invalidations)
+        if self._redis_ttl is not None:
+            await self._set(
+                keys=[self._get_key(snapshot.id), self._get_version_key(snapshot.id)],
+                args=[snapshot.dumps(), self._redis_ttl, ticket.version]
+            )
+
+    async def invalidate(self, *user_ids: int) -> None:
+        """
+        Removes the users from every tier of every process.
+        It must be called after the changes have been committed.
+        """
+        if not user_ids:
+            return
+
+        self._invalidations += 1
+        for user_id in user_ids:
+            self._entries.pop(user_id, None)
+
+        pipeline = self._redis_storage.pipeline(transaction=False)
+        if self._redis_ttl is not None:
+            # The versions are bumped before the snapshots are deleted,
+            # so that no load that has missed can cache one in between.
+            # A version outlives any load, then expires.
+            for user_id in user_ids:
+                pipeline.incr(self._get_version_key(user_id))
+                pipeline.expire(self._get_version_key(user_id), self._redis_ttl)
+            pipeline.delete(*(self._get_key(user_id) for user_id in user_ids))
+        pipeline.publish(self.channel, ",".join(map(str, user_ids)))
+        await pipeline.execute()
+
+    def start(self) -> None:
+        if self._max_size > 0:
+            self._subscription.start()
+
+    async def stop(self) -> None:
+        await self._subscription.stop()
+
+
+user_cache = UserCache(
+    redis,
+    settings.USER_CACHE_MAX_SIZE,
+    settings.USER_CACHE_TTL,
+    settings.USER_CACHE_REDIS_TTL if settings.USER_CACHE_REDIS_ENABLED else None
+)
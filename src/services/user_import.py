@@ -0,0 +1,301 @@
+"""
+Imports users in bulk, e.g. accounts migrated from a legacy system,
+from a CSV file with a header row, or a JSON Lines file.
+
+Each record holds 'first_name', 'last_name', 'email_address' and
+'password', and optionally 'is_confirmed' (true by default). A password
+which is already a bcrypt or argon2 hash is stored as is, and upgraded
+on the user's next login if its scheme or costs are outdated. Its scheme
+must be one of PASSWORD_HASHING_SCHEMES, otherwise it couldn't be
+verified, and the import is aborted. Other passwords are hashed by a
+pool of processes, one per CPU by default.
+
+Records are loaded in chunks, each copied into a staging table and
+inserted from there in its own transaction; records whose email address
+is already taken are skipped. After each chunk, the progress is written
+to a checkpoint file, from which an interrupted import resumes.
+
+Usage:
+  python -m src.services.user_import users.csv [--format csv|jsonl]
+                                              [--chunk-size 1000] [--workers 8]
+                                              [--checkpoint users.csv.checkpoint]
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, TYPE_CHECKING
+
+import pydantic
+from passlib.context import CryptContext
+
+from src.database.engine import engine
+from src.models import User
+from src.security.password import PasswordHasher, ctx
+from src.settings import settings
+
+if TYPE_CHECKING:
+    from asyncpg import Connection
+
+
+logger = logging.getLogger(__name__)
+
+
+# Recognises the hashes imported as they are, whatever the configured schemes.
+IMPORTED_HASHES = CryptContext(schemes=["bcrypt", "argon2"])
+COLUMNS = ("first_name", "last_name", "email_address", "password", "is_confirmed", "created_at")
+STAGING_TABLE = "user_import"
+
+
+class UnverifiableHash(Exception):
+    """
+    Raised when a record holds a hash whose scheme
+    isn't one of the configured schemes.
+    """
+
+
+class ImportedUser(pydantic.BaseModel):
+    first_name: str = pydantic.Field(min_length=1, max_length=50)
+    last_name: str = pydantic.Field(max_length=50)
+    email_address: pydantic.EmailStr
+    password: str = pydantic.Field(min_length=1)
+    is_confirmed: bool = True
+
+
+@dataclass
+class ImportProgress:
+    records: int = 0
+    inserted: int = 0
+    conflicts: int = 0
+    rejected: int = 0
+
+    @classmethod
+    def load(cls, path: Path) -> "ImportProgress":
+        """
+        Returns: The progress saved to the checkpoint, if it exists.
+        """
+        if not path.exists():
+            return cls()
+        return cls(**json.loads(path.read_text()))
+
+    def save(self, path: Path) -> None:
+        # Replacing the file is atomic, so an interruption
+        # can't leave a partially written checkpoint.
+        temporary_path = path.with_name(f"{path.name}.tmp")
+        temporary_path.write_text(json.dumps(asdict(self)))
+        os.replace(temporary_path, path)
+
+
+def read_records(path: Path, input_format: str) -> Iterator[dict]:
+    """
+    Returns: The records of the file, read lazily.
+    """
+    with path.open(newline="" if input_format == "csv" else None) as file:
+        if input_format == "csv":
+            for record in csv.DictReader(file):
+                # Empty cells fall back to the defaults.
+                yield {key: value for key, value in record.items() if value != ""}
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def read_chunks(records: Iterator[dict], chunk_size: int) -> Iterator[list[dict]]:
+    while chunk := list(islice(records, chunk_size)):
+        yield chunk
+
+
+async def prepare_chunk(records: list[dict],
+                        first_index: int,
+                        hasher: PasswordHasher) -> tuple[list[tuple], int]:
+    """
+    Returns: The rows to copy, in the order of COLUMNS, with their
+             passwords hashed, and the number of invalid records.
+
+    Raises:
+      UnverifiableHash: If a password is a hash the application can't verify.
+    """
+    users = []
+    for index, record in enumerate(records, first_index):
+        try:
+            users.append(ImportedUser.parse_obj(record))
+        except pydantic.ValidationError as error:
+            logger.warning("The record %d is invalid: %s", index, error.errors())
+
+    # Checked before anything is hashed, as the whole import is aborted.
+    for user in users:
+        scheme = IMPORTED_HASHES.identify(user.password, required=False)
+        if scheme is not None and scheme not in ctx.schemes():
+            raise UnverifiableHash(
+                f"The password of {user.email_address} is hashed with {scheme}, "
+                f"which must be added to PASSWORD_HASHING_SCHEMES to import it."
+            )
+
+    async def get_hash(password: str) -> str:
+        if IMPORTED_HASHES.identify(password, required=False) is not None:
+            return password
+        return await hasher.hash(password)
+
+    hashed_passwords = await asyncio.gather(*(get_hash(user.password) for user in users))
+    created_at = datetime.utcnow()
+    rows = [
+        (user.first_name, user.last_name, user.email_address,
+         hashed_password, user.is_confirmed, created_at)
+        for user, hashed_password in zip(users, hashed_passwords)
+    ]
+    return rows, len(records) - len(users)
+
+
+async def create_staging_table(connection: "Connection") -> None:
+    # It's emptied by every commit, so each chunk starts afresh.
+    await connection.execute(f"""
+        CREATE TEMPORARY TABLE {STAGING_TABLE} (
+            first_name varchar NOT NULL,
+            last_name varchar NOT NULL,
+            email_address varchar NOT NULL,
+            password varchar NOT NULL,
+            is_confirmed boolean NOT NULL,
+            created_at timestamp NOT NULL
+        ) ON COMMIT DELETE ROWS
+    """)
+
+
+async def load_chunk(connection: "Connection", rows: list[tuple]) -> int:
+    """
+    Returns: The number of inserted users, the others' email
+             addresses being taken.
+    """
+    columns = ", ".join(COLUMNS)
+    async with connection.transaction():
+        await connection.copy_records_to_table(STAGING_TABLE, records=rows, columns=COLUMNS)
+        status = await connection.execute(f"""
+            INSERT INTO "{User.__tablename__}" ({columns})
+            SELECT {columns} FROM {STAGING_TABLE}
+            ON CONFLICT (email_address) DO NOTHING
+        """)
+    # The status is "INSERT 0 <rows>".
+    return int(status.rsplit(" ", 1)[1])
+
+
+async def import_users(path: Path,
+                       input_format: str,
+                       chunk_size: int,
+                       workers: int | None,
+                       checkpoint_path: Path) -> ImportProgress:
+    """
+    Returns: The progress of the import, including previous runs.
+    """
+    progress = ImportProgress.load(checkpoint_path)
+    if progress.records:
+        print(f"Resuming after {progress.records} records.", file=sys.stderr)
+
+    records = islice(read_records(path, input_format), progress.records, None)
+    chunks = read_chunks(records, chunk_size)
+    hasher = PasswordHasher(workers, chunk_size, settings.PASSWORD_HASHING_START_METHOD)
+    started_at = time.monotonic()
+    loaded_records = 0
+
+    # SQLAlchemy is kept out of the transactions, which are asyncpg's.
+    async with engine.connect() as connection:
+        await connection.execution_options(isolation_level="AUTOCOMMIT")
+        raw_connection = await connection.get_raw_connection()
+        asyncpg_connection = raw_connection.driver_connection
+        await create_staging_table(asyncpg_connection)
+
+        try:
+            # The next chunk is hashed while the current one is loaded.
+            chunk = next(chunks, None)
+            preparation = None
+            if chunk is not None:
+                preparation = asyncio.create_task(prepare_chunk(chunk, progress.records, hasher))
+            while preparation is not None:
+                rows, rejected = await preparation
+                chunk_records = len(chunk)
+
+                chunk = next(chunks, None)
+                preparation = None
+                if chunk is not None:
+                    preparation = asyncio.create_task(prepare_chunk(
+                        chunk, progress.records + chunk_records, hasher
+                    ))
+
+                inserted = await load_chunk(asyncpg_connection, rows) if rows else 0
+                progress.records += chunk_records
+                progress.inserted += inserted
+                progress.conflicts += len(rows) - inserted
+                progress.rejected += rejected
+                progress.save(checkpoint_path)
+
+                loaded_records += chunk_records
+                rate = loaded_records / (time.monotonic() - started_at)
+                print(
+                    f"{progress.records} records: {progress.inserted} inserted, "
+                    f"{progress.conflicts} taken, {progress.rejected} invalid "
+                    f"({rate:.0f} records/s)",
+                    file=sys.stderr
+                )
+        finally:
+            if preparation is not None:
+                preparation.cancel()
+            await asyncpg_connection.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+            hasher.shutdown()
+
+    await engine.dispose()
+    return progress
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", type=Path)
+    parser.add_argument(
+        "--format",
+        choices=("csv", "jsonl"),
+        help="The format of the file, guessed from its extension by default."
+    )
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="The number of hashing processes, the number of CPUs by default."
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        help="The checkpoint file, the path of the file with '.checkpoint' appended by default."
+    )
+    arguments = parser.parse_args()
+
+    logging.basicConfig()
+    input_format = arguments.format or (
+        "jsonl" if arguments.path.suffix in (".jsonl", ".ndjson") else "csv"
+    )
+    checkpoint_path = arguments.checkpoint or arguments.path.with_name(
+        f"{arguments.path.name}.checkpoint"
+    )
+    try:
+        progress = asyncio.run(import_users(
+            arguments.path,
+            input_format,
+            arguments.chunk_size,
+            arguments.workers,
+            checkpoint_path
+        ))
+    except UnverifiableHash as exception:
+        sys.exit(f"The import has been aborted: {exception}")
+    print(
+        f"Done: {progress.inserted} users inserted, {progress.conflicts} email "
+        f"addresses already taken, {progress.rejected} invalid records."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,68 +1,266 @@
+import asyncio
+import time
+from dataclasses import dataclass
 from datetime import datetime
-from typing import TYPE_CHECKING
+from typing import Iterable, TYPE_CHECKING
 
-from sqlalchemy import select
+from sqlalchemy import Integer, any_, bindparam, delete, false, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 
+from src.metrics import timed
+from src.metrics.instruments import USERS_QUERY_SECONDS
 from src.models import User
-from src.schemas import UserCreationSchema, Credentials
-from src.security.password import get_hashed_password, check_password
+from src.schemas import (
+    UserCreationSchema,
+    UserDisplaySchema,
+    Credentials,
+    UserCredentials,
+    UserSnapshot
+)
+from src.security.jwt.generations import generations
+from src.security.password import hash_password, verify_and_update_password
+from src.services.user_cache import user_cache
 from src.settings import settings
 
 if TYPE_CHECKING:
     from sqlalchemy.ext.asyncio import AsyncSession
 
 
+# The read paths of authentication select only the columns they need
+# into plain records, sparing the ORM's identity map and change tracking.
+# The statements are built once, and both their compiled form and their
+# prepared statements (per connection) are cached. Those marked read-only
+# may be served by a replica.
+SNAPSHOT_COLUMNS = (
+    User.id,
+    User.first_name,
+    User.last_name,
+    User.email_address,
+    User.is_confirmed,
+    User.created_at
+)
+# It fills the user cache, which the invalidations of a change must not
+# find refilled from a lagging replica, so it's read from the primary.
+SELECT_SNAPSHOT_BY_ID = (
+    select(*SNAPSHOT_COLUMNS)
+    .where(User.id == bindparam("user_id"))
+)
+# A single array parameter, rather than one parameter per identifier.
+SELECT_SNAPSHOTS_BY_IDS = (
+    select(*SNAPSHOT_COLUMNS)
+    .where(User.id == any_(bindparam("user_ids", type_=ARRAY(Integer))))
+    .execution_options(read_only=True)
+)
+# Read from the primary, as a lagging replica would still accept
+# a password that has just been changed.
+SELECT_CREDENTIALS_BY_EMAIL_ADDRESS = (
+    select(User.id, User.password, User.is_confirmed)
+    .where(User.email_address == bindparam("email_address"))
+)
+# Only replaces the hash it was computed from, so that a rehash
+# can't overwrite a password changed in the meantime.
+UPDATE_PASSWORD = (
+    update(User)
+    .where(User.id == bindparam("user_id"), User.password == bindparam("old_password"))
+    .values(password=bindparam("new_password"))
+    .execution_options(synchronize_session=False)
+)
+
+
+@timed(USERS_QUERY_SECONDS, "get_user_by_id")
 async def get_user_by_id(session: "AsyncSession", user_id: int) -> User | None:
+    """
+    Returns: The user, read from the primary, to be changed.
+    """
     return await session.get(User, user_id)
 
 
+@timed(USERS_QUERY_SECONDS, "get_user_snapshot")
+async def get_user_snapshot(session: "AsyncSession", user_id: int) -> UserSnapshot | None:
+    """
+    Returns: A read-only snapshot of the user, served from the cache
+             when possible. Use get_user_by_id to change the user.
+    """
+    snapshot, ticket = await user_cache.get(user_id)
+    if snapshot is not None:
+        return snapshot
+
+    snapshot = await load_user_snapshot(session, user_id)
+    if snapshot is not None:
+        await user_cache.set(snapshot, ticket)
+    return snapshot
+
+
+@timed(USERS_QUERY_SECONDS, "load_user_snapshot")
+async def load_user_snapshot(session: "AsyncSession", user_id: int) -> UserSnapshot | None:
+    """
+    Returns: A read-only snapshot of the user, read from the primary.
+    """
+    result = await session.execute(SELECT_SNAPSHOT_BY_ID, {"user_id": user_id})
+    row = result.first()
+    return None if row is None else UserSnapshot(*row)
+
+
+@timed(USERS_QUERY_SECONDS, "get_user_snapshots")
+async def get_user_snapshots(session: "AsyncSession",
+                             user_ids: Iterable[int]) -> dict[int, UserSnapshot]:
+    """
+    Returns: Read-only snapshots of the users by their identifiers,
+             read by a single query. Missing users are left out.
+    """
+    result = await session.execute(SELECT_SNAPSHOTS_BY_IDS, {"user_ids": list(set(user_ids))})
+    return {row[0]: UserSnapshot(*row) for row in result}
+
+
+@timed(USERS_QUERY_SECONDS, "get_user_credentials")
+async def get_user_credentials(session: "AsyncSession",
+                               email_address: str) -> UserCredentials | None:
+    """
+    Returns: What authentication needs to know about the user
+             referenced by the email address, or None.
+    """
+    result = await session.execute(
+        SELECT_CREDENTIALS_BY_EMAIL_ADDRESS, {"email_address": email_address}
+    )
+    row = result.first()
+    return None if row is None else UserCredentials(*row)
+
+
+@timed(USERS_QUERY_SECONDS, "get_user_by_email_address")
 async def get_user_by_email_address(session: "AsyncSession", email_address: str) -> User | None:
+    """
+    Returns: The user, possibly read from a replica, so not to be changed.
+    """
     result = await session.execute(
-        select(User).where(User.email_address == email_address)
+        select(User)
+        .where(User.email_address == email_address)
+        .execution_options(read_only=True)
     )
     return result.scalar()
 
 
+@timed(USERS_QUERY_SECONDS, "create_user")
 async def create_user(session: "AsyncSession",
-                      user_creation_data: UserCreationSchema) -> User:
+                      user_creation_data: UserCreationSchema) -> UserDisplaySchema | None:
     """
     Creates a new user in the database, pre-hashing his password.
+
+    Returns: The new user, or None if the email address is already taken.
+
+    Notes:
+      The user is inserted and returned by a single statement, which
+      leaves the row alone if the email address is taken, so concurrent
+      registrations with the same address can't violate its uniqueness.
     """
-    new_user = User(
-        first_name=user_creation_data.first_name,
-        last_name=user_creation_data.last_name,
-        email_address=user_creation_data.email_address,
-        password=get_hashed_password(user_creation_data.password)
+    hashed_password = await hash_password(user_creation_data.password)
+    statement = (
+        insert(User)
+        .values(
+            first_name=user_creation_data.first_name,
+            last_name=user_creation_data.last_name,
+            email_address=user_creation_data.email_address,
+            password=hashed_password
+        )
+        .on_conflict_do_nothing(index_elements=[User.email_address])
+        .returning(
+            User.id,
+            User.first_name,
+            User.last_name,
+            User.is_confirmed,
+            User.email_address
+        )
     )
-    session.add(new_user)
-
+    result = await session.execute(statement)
+    row = result.first()
     await session.commit()
-    await session.refresh(new_user)
 
-    return new_user
+    return None if row is None else UserDisplaySchema.from_orm(row)
 
 
+@timed(USERS_QUERY_SECONDS, "authenticate_user")
 async def authenticate_user(session: "AsyncSession",
-                            credentials: Credentials) -> User | None:
+                            credentials: Credentials) -> UserCredentials | None:
     """
     Returns: The user referenced by the given email address, if the given password
              matches the required one, and this user is confirmed. Otherwise, None.
+
+    Notes:
+      If the stored hash was made by a deprecated scheme or with
+      outdated costs, it's replaced by a new one as a side effect.
     """
-    user = await get_user_by_email_address(session, credentials.email_address)
+    user = await get_user_credentials(session, credentials.email_address)
+    if user is None or not user.is_confirmed:
+        return None
 
-    is_allowed = (
-        user is not None and
-        user.is_confirmed and
-        check_password(credentials.password, user.password)
+    is_allowed, new_hashed_password = await verify_and_update_password(
+        credentials.password, user.password
     )
-    if is_allowed:
-        return user
+    if not is_allowed:
+        return None
+
+    if new_hashed_password is not None:
+        await session.execute(UPDATE_PASSWORD, {
+            "user_id": user.id,
+            "old_password": user.password,
+            "new_password": new_hashed_password
+        })
+        await session.commit()
+    return user
+
+
+@timed(USERS_QUERY_SECONDS, "confirm_user")
+async def confirm_user(session: "AsyncSession", user: User) -> None:
+    user_id = user.id
+    user.is_confirmed = True
+    await session.commit()
+    await user_cache.invalidate(user_id)
+
+
+@timed(USERS_QUERY_SECONDS, "change_password")
+async def change_password(session: "AsyncSession", user: User, new_password: str) -> None:
+    """
+    Changes the password, and revokes the user's access tokens.
+    """
+    user_id = user.id
+    user.password = await hash_password(new_password)
+    await session.commit()
+    await user_cache.invalidate(user_id)
+    await revoke_access_tokens(user_id)
+
+
+@timed(USERS_QUERY_SECONDS, "delete_user")
+async def delete_user(session: "AsyncSession", user: User) -> None:
+    """
+    Deletes the user, and revokes their access tokens.
+    """
+    user_id = user.id
+    await session.delete(user)
+    await session.commit()
+    await user_cache.invalidate(user_id)
+    await revoke_access_tokens(user_id)
+
+
+async def revoke_access_tokens(user_id: int) -> None:
+    """
+    Makes every access token issued to the user so far invalid.
+    """
+    await generations.bump(user_id)
+
+
+@dataclass(frozen=True)
+class CleanupReport:
+    deleted_users: int
+    batches: int
+    duration: float
 
 
-async def delete_unconfirmed_users(session: "AsyncSession") -> None:
+async def delete_unconfirmed_users(session: "AsyncSession") -> CleanupReport:
     """
     Deletes users who haven't yet been confirmed.
 
+    Returns: How many users have been deleted, in how many
+             batches, and how many seconds it has taken.
+
     Notes:
       * Unconfirmed users who're expected to confirm their
         registration won't be deleted.
@@ -76,17 +274,43 @@ async def delete_unconfirmed_users(session: "AsyncSession") -> None:
         First, it optimizes the database. In addition, we allow
         re-registration to any previously taken email address that can't
         be confirmed because a JSON Web Token issued for this has expired.
+
+      * Users are deleted by the database in batches, each in its own
+        short transaction followed by a pause, so that a large backlog
+        neither holds locks for long nor saturates the database.
+        Rows locked by concurrent transactions are left for the next run.
     """
-    statement = select(User).where(
-        User.is_confirmed.is_(False)
+    started_at = time.monotonic()
+    cutoff = datetime.utcnow() - settings.MFA_TOKEN_LIFETIME
+    batch_size = settings.USERS_CLEANUP_BATCH_SIZE
+
+    # The predicate matches the partial index on 'created_at'.
+    batch = (
+        select(User.id)
+        .where(User.is_confirmed == false(), User.created_at <= cutoff)
+        .order_by(User.created_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    statement = (
+        delete(User)
+        .where(User.id.in_(batch))
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
     )
-    unconfirmed_users = await session.execute(statement)
 
-    for unconfirmed_user in unconfirmed_users.scalars():
-        confirmation_token_expiration_ts = (
-            unconfirmed_user.created_at + settings.MFA_JWT_TOKEN_LIFETIME
-        )
-        if datetime.utcnow() >= confirmation_token_expiration_ts:
-            await session.delete(unconfirmed_user)
+    deleted_users = batches = 0
+    while True:
+        result = await session.execute(statement)
+        deleted_user_ids = result.scalars().all()
+        await session.commit()
+        await user_cache.invalidate(*deleted_user_ids)
 
-    await session.commit()
+        deleted_users += len(deleted_user_ids)
+        batches += 1
+        if len(deleted_user_ids) < batch_size:
+            break
+        await asyncio.sleep(settings.USERS_CLEANUP_BATCH_PAUSE)
+
+    return CleanupReport(deleted_users, batches, time.monotonic() - started_at)
@@ -1,5 +1,6 @@
 import typing
 from datetime import timedelta
+from pathlib import Path
 from secrets import token_urlsafe
 
 import pydantic
@@ -33,16 +34,137 @@ class Settings(pydantic.BaseSettings):
             path="/" + values.get("POSTGRES_DATABASE")
         )
 
+    POSTGRES_POOL_SIZE: int = 5
+    POSTGRES_MAX_OVERFLOW: int = 10
+    POSTGRES_POOL_TIMEOUT: float = 30
+    POSTGRES_POOL_RECYCLE: int = timedelta(minutes=30).total_seconds()
+    POSTGRES_POOL_USE_LIFO: bool = False
+    # The number of prepared statements cached by each connection,
+    # 0 disables the cache (required behind PgBouncer's transaction pooling).
+    POSTGRES_STATEMENT_CACHE_SIZE: int = 100
+    # How dead pooled connections are detected: a round trip on every
+    # checkout, a background check every POSTGRES_LIVENESS_CHECK_INTERVAL
+    # seconds, or only by the failure of a statement.
+    POSTGRES_LIVENESS_CHECK: typing.Literal["pre-ping", "periodic", "on-error"] = "pre-ping"
+    POSTGRES_LIVENESS_CHECK_INTERVAL: float = 30
+    # Read-only lookups are spread over the healthy replicas, if any,
+    # whose health is checked every POSTGRES_REPLICA_CHECK_INTERVAL seconds.
+    POSTGRES_REPLICA_URIS: list[pydantic.PostgresDsn] = []
+    POSTGRES_REPLICA_CHECK_INTERVAL: float = 10
+    POSTGRES_REPLICA_CHECK_TIMEOUT: float = 2
+
+    MAIL_USERNAME: str
+    MAIL_PASSWORD: str
+    MAIL_FROM: pydantic.EmailStr
+    MAIL_SERVER: str = "smtp.gmail.com"
+    MAIL_PORT: int = 587
+    MAIL_STARTTLS: bool = True
+    MAIL_SSL: bool = False
+    MAIL_USE_CREDENTIALS: bool = True
+    MAIL_TIMEOUT: float = 30
+
+    EMAIL_OUTBOX_MAX_LENGTH: int = 100_000
+    # The number of SMTP connections kept by each process,
+    # 0 means that the process doesn't send emails itself.
+    EMAIL_SENDER_CONNECTIONS: int = 2
+    EMAIL_SENDER_BATCH_SIZE: int = 20
+    EMAIL_SENDER_MAX_ATTEMPTS: int = 5
+    EMAIL_SENDER_RETRY_DELAY: float = 5
+    EMAIL_SENDER_CLAIM_IDLE_TIME: float = 60
+
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DATABASE: str | int = 0
     REDIS_PASSWORD: str | None = None
 
-    JWT_ALGORITHM = "HS256"
+    # The first scheme is used to hash new passwords, the rest are
+    # only verified and transparently replaced on the next login.
+    PASSWORD_HASHING_SCHEMES: list[typing.Literal["bcrypt", "argon2"]] = ["bcrypt"]
+    BCRYPT_ROUNDS: int = 12
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 64 * 1024
+    ARGON2_PARALLELISM: int = 4
+
+    PASSWORD_HASHING_WORKERS: int | None = None
+    PASSWORD_HASHING_MAX_QUEUE_DEPTH: int = 256
+    PASSWORD_HASHING_START_METHOD: typing.Literal["spawn", "forkserver"] = "spawn"
+
+    # "shared-memory" only suits a single host, whose worker processes
+    # share the table file, preferably on a tmpfs such as /dev/shm.
+    JWT_BLACKLIST_BACKEND: typing.Literal["redis", "postgres", "shared-memory"] = "redis"
+    JWT_BLACKLIST_SWEEP_INTERVAL: float = timedelta(minutes=5).total_seconds()
+    JWT_BLACKLIST_SHARED_MEMORY_PATH: Path = Path("/dev/shm/jwt-blacklist")
+    # The number of slots, 24 bytes each, which should be at least
+    # twice the number of JSON Web Tokens blacklisted at a time.
+    JWT_BLACKLIST_SHARED_MEMORY_CAPACITY: int = 1 << 20
+    JWT_BLACKLIST_BATCH_MAX_SIZE: int = 128
+    JWT_BLACKLIST_BATCH_MAX_WAIT: float = 0
+    JWT_BLACKLIST_FILTER_ENABLED: bool = False
+    JWT_BLACKLIST_FILTER_FALSE_POSITIVE_RATE: float = 0.01
+    JWT_BLACKLIST_FILTER_MAX_SIZE: int = 16 * 1024 * 1024
+    JWT_BLACKLIST_FILTER_REBUILD_INTERVAL: int = timedelta(minutes=10).total_seconds()
+
+    # HS256 uses SECRET_TOKEN, the others use rotated key pairs.
+    JWT_ALGORITHM: typing.Literal["HS256", "RS256", "ES256"] = "HS256"
+    JWT_CLAIMS_CACHE_MAX_SIZE: int = 10_000
+    JWT_GENERATIONS_CACHE_MAX_SIZE: int = 100_000
+    # The bearer secret of the token introspection clients,
+    # e.g. API gateways. If it's None, introspection is disabled.
+    INTROSPECTION_SECRET: str | None = None
+    INTROSPECTION_MAX_TOKENS: int = 1000
+    JWT_FAST_DECODING: bool = True
     ACCESS_TOKEN_LIFETIME: timedelta = timedelta(hours=2)
     MFA_TOKEN_LIFETIME: timedelta = timedelta(hours=2)
+    # Requests for the same user and mission within the cooldown,
+    # or beyond the daily cap, succeed without sending anything.
+    MFA_TOKEN_COOLDOWN: timedelta = timedelta(minutes=2)
+    MFA_TOKEN_DAILY_CAP: int = 10
+
+    # The rates are "<requests>/<second|minute|hour|day>", None disables a limit.
+    RATE_LIMITING_ENABLED: bool = True
+    RATE_LIMIT_LOCAL_MAX_SIZE: int = 100_000
+    RATE_LIMIT_ACCESS_TOKEN_PER_IP: str | None = "30/minute"
+    RATE_LIMIT_ACCESS_TOKEN_PER_EMAIL: str | None = "10/minute"
+    RATE_LIMIT_ACCESS_TOKEN_GLOBAL: str | None = "200/second"
+    RATE_LIMIT_MFA_TOKEN_PER_IP: str | None = "10/minute"
+    RATE_LIMIT_MFA_TOKEN_PER_EMAIL: str | None = "5/minute"
+    RATE_LIMIT_MFA_TOKEN_GLOBAL: str | None = "100/second"
+
+    JWT_KEYS_DIRECTORY: Path = Path("jwt_keys")
+    JWT_KEYS_REFRESH_INTERVAL: int = 60
+    JWT_KEY_ROTATION_INTERVAL: timedelta = timedelta(days=30)
+    JWT_KEY_OVERLAP: timedelta | None = None
+    JWKS_MAX_AGE: int = 300
+
+    @pydantic.validator("JWT_KEY_OVERLAP", pre=True, always=True)
+    def construct_key_overlap(
+        cls,
+        value: timedelta | None,
+        values: dict[str | typing.Any]
+    ) -> timedelta:
+        """
+        A replaced key must stay verifiable for as
+        long as the JSON Web Tokens it has signed.
+        """
+        if value is not None:
+            return value
+
+        return max(
+            values.get("ACCESS_TOKEN_LIFETIME"),
+            values.get("MFA_TOKEN_LIFETIME")
+        )
+
+    USER_CACHE_MAX_SIZE: int = 10_000
+    USER_CACHE_TTL: int = 60
+    USER_CACHE_REDIS_ENABLED: bool = False
+    USER_CACHE_REDIS_TTL: int = timedelta(minutes=10).total_seconds()
 
     USERS_CLEANUP_DELAY: int = timedelta(days=7).total_seconds()
+    USERS_CLEANUP_BATCH_SIZE: int = 1000
+    USERS_CLEANUP_BATCH_PAUSE: float = 0.1
+
+    SCHEDULER_LEASE_TTL: float = 30
+    SCHEDULER_JITTER: float = 10
 
     class Config:
         case_sensitive = True